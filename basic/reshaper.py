@@ -1,8 +1,17 @@
+import functools
+import re
 import string
 # import tkinter as tk
 
 
 REVERSE = {'(': ')', ')': '('}
+RESHAPE_CACHE_SIZE = 2 ** 14  # reshaped row names and titles to remember, LogFile keeps its own reshaped lines
+
+_BOTH = re.escape(string.punctuation) + ' 0-9'
+_PUNCTUATIONS = re.compile(f'[{re.escape(string.punctuation)} ]*')
+# a run of the current language, the first char of every run but the first one is whatever broke the last run
+_RUNS = {True: re.compile(f'[{_BOTH}א-ת]*'), False: re.compile(f'[{_BOTH}a-zA-Z]*')}
+_REVERSE_TABLE = str.maketrans(REVERSE)
 
 
 def is_both(char):
@@ -24,65 +33,42 @@ def move_punctuations(s: str):
     """
     if not s:
         return s
-    start_spaces = ''
-    end_spaces = ''
-    for char in s:
-        if char in string.punctuation + ' ':
-            start_spaces += char
-        else:
-            break
-    for char in s[::-1]:
-        if char in string.punctuation + ' ':
-            end_spaces += char
-        else:
-            break
-    new_start = ''.join([REVERSE[c] if c in REVERSE else c for c in end_spaces])
-    new_end = ''.join([REVERSE[c] if c in REVERSE else c for c in start_spaces])
-    return new_start + s.lstrip(start_spaces).rstrip(end_spaces) + new_end
+    start = _PUNCTUATIONS.match(s).end()
+    if start == len(s):
+        # only punctuations, both ends are the whole string
+        return s[::-1].translate(_REVERSE_TABLE) + s.translate(_REVERSE_TABLE)
+    end = len(s) - _PUNCTUATIONS.match(s[::-1]).end()
+    return s[end:][::-1].translate(_REVERSE_TABLE) + s[start:end] + s[:start].translate(_REVERSE_TABLE)
+
+
+@functools.lru_cache(maxsize=RESHAPE_CACHE_SIZE)
+def _reshape_line(line: str):
+    if not line:
+        return line
+    is_current_hebrew = not is_english(line[0])
+    contain_hebrew = is_current_hebrew
+    breaks = []
+    pos = _RUNS[is_current_hebrew].match(line).end()
+    breaks.append((line[:pos], is_current_hebrew))
+    while pos < len(line):
+        is_current_hebrew = not is_current_hebrew
+        contain_hebrew = contain_hebrew or is_current_hebrew
+        end = _RUNS[is_current_hebrew].match(line, pos + 1).end()
+        breaks.append((line[pos:end], is_current_hebrew))
+        pos = end
+    breaks.reverse()
+    if not contain_hebrew:
+        return ''.join([part for part, _ in breaks])
+    parts = []
+    for part, is_heb in breaks:
+        if part.endswith(')') and not is_heb:
+            part = '(' + part[:-1]
+        parts.append(move_punctuations(part))
+    return ''.join(parts)
 
 
 def hebrew_reshaper(text: str):
-    sub_texts = text.split('\n')
-    new_strings = []
-    for sub_text in sub_texts:
-        if not sub_text:
-            new_strings.append('')
-            continue
-
-        breaks = []
-        is_current_hebrew = not is_english(sub_text[0])
-        contain_hebrew = is_current_hebrew
-        current_text = ''
-
-        for char in sub_text:
-            if is_current_hebrew:
-                if is_hebrew(char):
-                    current_text += char
-                else:
-                    breaks.append((current_text, is_current_hebrew))
-                    current_text = char
-                    is_current_hebrew = False
-            else:
-                if is_english(char):
-                    current_text += char
-                else:
-                    breaks.append((current_text, is_current_hebrew))
-                    current_text = char
-                    is_current_hebrew = True
-                    contain_hebrew = True
-        breaks.append((current_text, is_current_hebrew))
-        breaks = breaks[::-1]
-
-        if contain_hebrew:
-            for i in range(len(breaks)):
-                part, is_heb = breaks[i]
-                if part.endswith(')') and not is_heb:
-                    part = '(' + part[:-1]
-                part = move_punctuations(part)
-                breaks[i] = (part, is_heb)
-        new_string = ''.join([part for part, _ in breaks])
-        new_strings.append(new_string)
-    return '\n'.join(new_strings)
+    return '\n'.join([_reshape_line(sub_text) for sub_text in text.split('\n')])
 
 
 # def main():
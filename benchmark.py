@@ -0,0 +1,163 @@
+"""
+micro benchmarks for the hot paths of pinger++
+run: python benchmark.py
+"""
+
+from basic import reshaper
+from ping import *
+import datetime
+import random
+import string
+import struct
+import timeit
+
+
+CHECKSUM_SIZES = [32, 64, 256, 1024, 1500, 4096, 16384, 65500]
+RESHAPE_LINES = 2000
+RESHAPE_FUZZ = 20000
+RESHAPE_NAMES = ['שרת ראשי', 'מצלמה (כניסה)', 'router-01', 'נתב קומה 2', 'printer HP', 'שרת DNS!', 'AP-לובי']
+RESHAPE_CONTENTS = ['online -> offline', 'offline -> online', 'online -> unstable', 'מחובר', 'לא מחובר (timeout)']
+
+
+def legacy_cal_checksum(data):
+    """PingSocket.cal_checksum before it was vectorized (drops an odd trailing byte, folds once)"""
+    checksum = 0
+    num_words = len(data) // 2
+    for i in range(num_words):
+        word = (data[i * 2] << 8) + data[i * 2 + 1]
+        checksum += word
+    checksum = (checksum >> 16) + (checksum & 0xffff)
+    return ~checksum & 0xffff
+
+
+def reference_cal_checksum(data):
+    if len(data) % 2:
+        data = bytes(data) + b'\0'
+    checksum = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    while checksum >> 16:
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+    return ~checksum & 0xffff
+
+
+def legacy_move_punctuations(s):
+    """reshaper.move_punctuations before it was rewritten with regular expressions"""
+    if not s:
+        return s
+    start_spaces = ''
+    end_spaces = ''
+    for char in s:
+        if char in string.punctuation + ' ':
+            start_spaces += char
+        else:
+            break
+    for char in s[::-1]:
+        if char in string.punctuation + ' ':
+            end_spaces += char
+        else:
+            break
+    new_start = ''.join([reshaper.REVERSE[c] if c in reshaper.REVERSE else c for c in end_spaces])
+    new_end = ''.join([reshaper.REVERSE[c] if c in reshaper.REVERSE else c for c in start_spaces])
+    return new_start + s.lstrip(start_spaces).rstrip(end_spaces) + new_end
+
+
+def legacy_hebrew_reshaper(text):
+    """hebrew_reshaper before it was segmented with regular expressions and cached"""
+    new_strings = []
+    for sub_text in text.split('\n'):
+        if not sub_text:
+            new_strings.append('')
+            continue
+        breaks = []
+        is_current_hebrew = not reshaper.is_english(sub_text[0])
+        contain_hebrew = is_current_hebrew
+        current_text = ''
+        for char in sub_text:
+            if is_current_hebrew:
+                if reshaper.is_hebrew(char):
+                    current_text += char
+                else:
+                    breaks.append((current_text, is_current_hebrew))
+                    current_text = char
+                    is_current_hebrew = False
+            else:
+                if reshaper.is_english(char):
+                    current_text += char
+                else:
+                    breaks.append((current_text, is_current_hebrew))
+                    current_text = char
+                    is_current_hebrew = True
+                    contain_hebrew = True
+        breaks.append((current_text, is_current_hebrew))
+        breaks = breaks[::-1]
+        if contain_hebrew:
+            for i in range(len(breaks)):
+                part, is_heb = breaks[i]
+                if part.endswith(')') and not is_heb:
+                    part = '(' + part[:-1]
+                part = legacy_move_punctuations(part)
+                breaks[i] = (part, is_heb)
+        new_strings.append(''.join([part for part, _ in breaks]))
+    return '\n'.join(new_strings)
+
+
+def get_log_lines(count):
+    """log lines like LogFile.get_string_rtl builds them"""
+    rand = random.Random(0)
+    start = datetime.datetime(2024, 1, 1)
+    return [f'זמן: {(start + datetime.timedelta(seconds=i * 7)).strftime("%d.%m.%Y %H:%M:%S")} - '
+            f'{rand.choice(RESHAPE_NAMES)} (10.0.{i % 256}.{rand.randrange(1, 255)}) - {rand.choice(RESHAPE_CONTENTS)}'
+            for i in range(count)]
+
+
+def time_it(func, *args, min_time=0.2):
+    """return the average time of one call in microseconds"""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(3, number)) / number * 10 ** 6
+
+
+def benchmark_checksum():
+    print(f'checksum (numpy {"enabled" if numpy is not None else "not installed"})')
+    print(f'{"bytes":>8} {"legacy (us)":>12} {"new (us)":>10} {"speedup":>8}')
+    for size in CHECKSUM_SIZES + [size + 1 for size in CHECKSUM_SIZES[:-1]]:
+        data = get_payload(size)
+        assert PingSocket.cal_checksum(data) == reference_cal_checksum(data), size
+        legacy = time_it(legacy_cal_checksum, data)
+        new = time_it(PingSocket.cal_checksum, data)
+        print(f'{size:>8} {legacy:>12.2f} {new:>10.2f} {legacy / new:>7.1f}x')
+
+
+def benchmark_reshaper():
+    print('hebrew_reshaper')
+    rand = random.Random(1)
+    alphabet = 'אבגדהוזחטיכלמנסעפצקרשת' + string.ascii_letters + string.digits + string.punctuation + ' \t\né'
+    for _ in range(RESHAPE_FUZZ):
+        text = ''.join(rand.choice(alphabet) for _ in range(rand.randrange(12)))
+        assert reshaper.hebrew_reshaper(text) == legacy_hebrew_reshaper(text), repr(text)
+    lines = get_log_lines(RESHAPE_LINES)
+    log_str = '\n'.join(lines) + '\n'
+    assert reshaper.hebrew_reshaper(log_str) == legacy_hebrew_reshaper(log_str)
+    names = [line.split(' - ')[1] for line in lines]
+
+    def uncached(text):
+        reshaper._reshape_line.cache_clear()
+        return reshaper.hebrew_reshaper(text)
+
+    print(f'{"input":>22} {"legacy (us)":>12} {"new (us)":>10} {"cached (us)":>12} {"speedup":>8}')
+    for name, texts in [('row name (per row)', names), (f'log ({RESHAPE_LINES} lines)', [log_str])]:
+        times = []
+        for func in [legacy_hebrew_reshaper, uncached, reshaper.hebrew_reshaper]:
+            times.append(time_it(lambda: [func(text) for text in texts]) / len(texts))
+        legacy, new, cached = times
+        print(f'{name:>22} {legacy:>12.2f} {new:>10.2f} {cached:>12.2f} {legacy / cached:>7.1f}x')
+
+
+def main():
+    benchmark_checksum()
+    print()
+    benchmark_reshaper()
+
+
+if __name__ == '__main__':
+    main()
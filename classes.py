@@ -1,22 +1,41 @@
 from font import *
 from tkinter import filedialog as fd, messagebox as msgbox, ttk
+from ping import PingEngine, ShardedPingEngine, RangeSweep, use_datagram_sockets, RESULT_REPLY, RESULT_TIMEOUT, \
+    RESULT_LATE_REPLY, RESULT_PAUSE
+import collections
+import ipaddress
+import itertools
 import threading
 import time
-from ping import PingSocket
 
 
 TABLE_COLORS = [Color.RED, Color.YELLOW, Color.GREEN, Color.ORANGE, Color.GRAY]
 TABLE_HEADERS = ['(%) סטטיסטיקה', 'סטטוס', 'כתובת היעד', 'שם היעד']
+SWEEP_POLL_INTERVAL = 200
+# rows added by auto insert between two turns of the event loop
+AUTO_INSERT_CHUNK = 256
+# the gui applies the queued results every GUI_REFRESH_INTERVAL ms, for at most GUI_FRAME_BUDGET ms
+GUI_REFRESH_INTERVAL = 50
+GUI_FRAME_BUDGET = 20
+UPDATE_REPLY = 0
+UPDATE_LATE_REPLY = 1
+UPDATE_PAUSE = 2
+UPDATE_REFRESH = 3
+UPDATE_STORED = 4
+# results of the same color in a row that make a change of color (the rest are jitter)
+COLOR_CHANGE_RESULTS = 2
 
 
 class PingTable(Table):
     def __init__(self, master: tk.PanedWindow, pos, tables, table_index):
-        super(PingTable, self).__init__(master, TABLE_HEADERS, pos)
+        # the virtual setting is read once per table, it takes effect on the next start
+        super(PingTable, self).__init__(master, TABLE_HEADERS, pos, bool(settings.virtual_table))
         self._master.after(0, self._check_pingers)
         self._tables: List[PingTable] = tables
         self._table_index = table_index
-        self._ping_threads: List[threading.Thread] = []
         self._item_indexes: Dict[str, PingTableLine] = {}
+        # the values last written to every row, rows are only written again when they change
+        self._rendered: Dict[str, tuple] = {}
 
         for color in TABLE_COLORS:
             self._tree.tag_configure(color, background=color)
@@ -47,13 +66,16 @@ class PingTable(Table):
         self._remove_cmd()
 
     def _remove_cmd(self):
-        for iid in self.selection:
-            self._tree.delete(iid)
+        iids = self.selection
+        self.remove(*iids)
+        for iid in iids:
             self._item_indexes.pop(iid).kill()
+            self._rendered.pop(iid, None)
         self._have_changed = True
 
     def _switch_pos(self, first, second):
         super(PingTable, self)._switch_pos(first, second)
+        self._rendered[first], self._rendered[second] = self._rendered.get(second), self._rendered.get(first)
         first_row, second_row = self._item_indexes[first], self._item_indexes[second]
         first_row.iid, second_row.iid = second_row.iid, first_row.iid
         self._item_indexes[first], self._item_indexes[second] = second_row, first_row
@@ -71,9 +93,9 @@ class PingTable(Table):
         key_code = event.keycode
         if key_code == Keycodes.A:
             if pressed_keys[Modifiers.CTRL]:
-                self._tree.selection_set(self.children)
+                self.selection_set(self.children)
         elif key_code == Keycodes.ESCAPE:
-            self._tree.selection_set([])
+            self.selection_set([])
         elif key_code == Keycodes.DELETE:
             self._remove_cmd()
         elif key_code in [Keycodes.UP, Keycodes.DOWN]:
@@ -86,53 +108,50 @@ class PingTable(Table):
                         self._backward_cmd()
                 else:
                     children = self.children
-                    top_most = selection[0]
-                    for i, child in enumerate(children):
-                        if child == top_most:
-                            direction = -1 if key_code == Keycodes.UP else 1
-                            new_selection = children[(i + direction) % len(children)]
-                            self._tree.selection_set(new_selection)
-                            self._tree.see(new_selection)
-                            break
+                    direction = -1 if key_code == Keycodes.UP else 1
+                    new_selection = children[(children.index(selection[0]) + direction) % len(children)]
+                    self.selection_set(new_selection)
+                    self.see(new_selection)
+                # the treeview's own key navigation only knows the rows in the window of a virtual table
+                return 'break'
 
     def add(self, host_and_ip_address):
         name, ip = host_and_ip_address
         if name and ip:
             iid = super(PingTable, self).add(['?%', Status.CALCULATING, ip, hebrew_reshaper(name)])
             new_line = PingTableLine(self._master, self, name, ip, iid)
+            try:
+                ping_engine.add(new_line)
+            except RuntimeError:
+                # the engine is full, no row is left unpinged
+                new_line.kill()
+                self.remove(iid)
+                raise
             self._item_indexes[iid] = new_line
+            new_line.refresh()
 
             self._have_changed = True
-            thread = threading.Thread(target=pinger_thread,
-                                      args=[new_line, (self._table_index+1) * 1000 + len(self._ping_threads)])
-            self._ping_threads.append(thread)
-            thread.start()
-
-    def join(self):
-        for thread in self._ping_threads:
-            thread.join()
 
     def reset(self):
         for line in self._item_indexes.values():
             line.kill()
-        for i in self.children:
-            self._tree.delete(i)
+        self.remove(*self.children)
         self._item_indexes = {}
+        self._rendered = {}
 
     def _submit_updates(self, iid, color, name, ip, status, statistics):
-        children = self.children
-        self._tree.delete(iid)
-        name = hebrew_reshaper(name)
-        self._tree.insert('', children.index(iid), iid=iid, values=[statistics, status, ip, name], tags=[color])
+        values = (color, name, ip, status, statistics)
+        if self._rendered.get(iid) != values:
+            self._rendered[iid] = values
+            self.set_row(iid, [statistics, status, ip, hebrew_reshaper(name)], [color])
+
+    def refresh_line(self, line):
+        self._submit_updates(*line.values)
+        line.add_data_to_window()
 
     def _check_pingers(self):
+        # the rows are redrawn by the update queue when their results arrive
         log.update()
-        selection = self.selection
-        for iid in self._item_indexes:
-            line = self._item_indexes[iid]
-            self._submit_updates(*line.values)
-            line.add_data_to_window()
-        self._tree.selection_set(selection)
         self._master.after(settings.ping_sleep_timer, self._check_pingers)
 
     @property
@@ -140,7 +159,7 @@ class PingTable(Table):
         return [(line.host_name, line.ip_address) for line in self._item_indexes.values()]
 
     def move_table_cmd(self):
-        self._tree.selection_set(self.children)
+        self.selection_set(self.children)
         self._move_table_cmd()
 
 
@@ -181,7 +200,7 @@ class Statistics:
 class ColorMaster:
     def __init__(self):
         self._log_line = None
-        self._last_colors = [None] * 2   # len(last_colors) = amount of values to consider change (remove jitters)
+        self._last_colors = [None] * COLOR_CHANGE_RESULTS   # amount of values to consider change (remove jitters)
         self._last_change_color = None
 
     def update(self, color):
@@ -224,12 +243,15 @@ class PingTableLine:
         self._vsb = None
         self._check_btn_v = None
         self._check_button = None
-        self._data: List[Tuple[str, COLOR]] = []
+        # lines waiting for the detail window, only the last settings.window_history are kept
+        self._data: Deque[Tuple[str, COLOR]] = collections.deque(maxlen=settings.window_history)
 
         self._color = ColorMaster()
         self._statistics = Statistics()
         self._status = Status.CALCULATING
         self._last_status_change = None
+        # (version, replies, losses) of the last result read from the result table of a ShardedPingEngine
+        self._stored = (0, 0, 0)
         self._is_alive = True
         self._pause = False
         self._read_start_pos()
@@ -240,7 +262,11 @@ class PingTableLine:
 
     @property
     def _have_data(self):
-        return self._data != []
+        return bool(self._data)
+
+    @property
+    def window_open(self):
+        return self._have_window
 
     @property
     def host_name(self):
@@ -261,6 +287,9 @@ class PingTableLine:
         self._statistics = Statistics()
         self._status = Status.CALCULATING
         self._last_status_change = None
+        # the client gets a new slot of the result table
+        self._stored = (0, 0, 0)
+        ping_engine.changed(self)
 
     @property
     def status(self):
@@ -297,6 +326,7 @@ class PingTableLine:
     @pause.setter
     def pause(self, pause):
         self._pause = pause
+        ping_engine.changed(self)
 
     @property
     def iid(self):
@@ -308,6 +338,8 @@ class PingTableLine:
 
     def add_data(self, data, color):
         if self._have_window:
+            if self._data.maxlen != settings.window_history:
+                self._data = collections.deque(self._data, maxlen=settings.window_history)
             self._data.append((data, color))
 
     def update_line(self, color):
@@ -315,18 +347,92 @@ class PingTableLine:
         log_mode = self._color.update(color)
         if log_mode and not (settings.log_ignore_dock and log_mode in [LOG_MODE_Y2R, LOG_MODE_R2Y]):
             log.add(self.host_name, log_mode)
-        # change color and status
+        # change color and status, the statistics are counted by apply
         if color in [Color.GREEN, Color.ORANGE]:
             if self._status == Status.OFFLINE or Status.CALCULATING:
                 self.status = Status.ONLINE
-            self._statistics += True
         elif color in [Color.RED, Color.YELLOW]:
             if self._status == Status.ONLINE or Status.CALCULATING:
                 self.status = Status.OFFLINE
-            self._statistics += False
         else:
             self.status = Status.PAUSED
 
+    def on_reply(self, answer, rtt):
+        updates.put(self, UPDATE_REPLY, answer, rtt)
+
+    def on_late_reply(self, answer, rtt):
+        updates.put(self, UPDATE_LATE_REPLY, answer, rtt)
+
+    def on_pause(self):
+        updates.put(self, UPDATE_PAUSE)
+
+    def on_result(self):
+        """a ShardedPingEngine stored new results, they are read by apply"""
+        updates.put(self, UPDATE_STORED)
+
+    def refresh(self):
+        """redraw the row on the next frame"""
+        updates.put(self, UPDATE_REFRESH)
+
+    def apply(self, update: 'PendingUpdate'):
+        """apply the results coalesced in update by the ping threads, from the gui thread"""
+        if update.stored:
+            self._read_stored(update)
+        for when, answer, color in update.lines:
+            self.add_data(f'{datetime.datetime.fromtimestamp(when).strftime("%d.%m.%Y %H:%M:%S")} -> {answer}', color)
+        # a burst longer than the statistics only leaves its last results in them
+        for _ in range(min(update.failed, settings.statistics_capacity)):
+            self._statistics += False
+        for _ in range(min(update.passed, settings.statistics_capacity)):
+            self._statistics += True
+        for color in update.colors:
+            self.update_line(color)
+
+    def refresh_row(self):
+        self._table.refresh_line(self)
+
+    def _read_stored(self, update: 'PendingUpdate'):
+        """add the results stored by a ShardedPingEngine since the last read to update"""
+        result = ping_engine.result(self)
+        if result is None:
+            return
+        version, kind, rtt, replies, losses, updated, answer = result
+        seen_version, seen_replies, seen_losses = self._stored
+        if version == seen_version:
+            return
+        if replies < seen_replies or losses < seen_losses:
+            # the slot was cleared for the client
+            seen_replies = seen_losses = 0
+        self._stored = version, replies, losses
+        # only the last rtt is stored, the replies in between get its color
+        color = self.reply_color(rtt)
+        if color in [Color.GREEN, Color.ORANGE]:
+            update.passed += replies - seen_replies
+        else:
+            update.failed += replies - seen_replies
+        update.failed += losses - seen_losses
+        colors = [color] * min(replies - seen_replies, COLOR_CHANGE_RESULTS)
+        lost = [Color.RED] * min(losses - seen_losses, COLOR_CHANGE_RESULTS)
+        # the kind of the last result tells which came last
+        update.colors.extend(colors + lost if kind == RESULT_TIMEOUT else lost + colors)
+        if kind == RESULT_PAUSE:
+            update.colors.append(Color.GRAY)
+        elif self.window_open and kind == RESULT_LATE_REPLY:
+            update.lines.append((updated, f'{answer} (late)', Color.GRAY))
+        elif self.window_open and kind in [RESULT_REPLY, RESULT_TIMEOUT]:
+            update.lines.append((updated, answer, self.reply_color(rtt if kind == RESULT_REPLY else 0)))
+
+    @staticmethod
+    def reply_color(rtt):
+        # rtt is in microseconds, the thresholds are in milliseconds
+        if rtt:
+            if rtt < settings.min_threshold * 1000:
+                return Color.YELLOW
+            elif rtt < settings.max_threshold * 1000:
+                return Color.GREEN
+            return Color.ORANGE
+        return Color.RED
+
     def create_window(self):
         if not self._have_window:
             self._my_window = tk.Toplevel(self._root)
@@ -350,17 +456,26 @@ class PingTableLine:
     def close_window(self):
         self._my_window.destroy()
         self._my_window = None
-        self._data = []
+        self._data.clear()
 
     def add_data_to_window(self):
-        while self._have_data:
-            data, color = self._data.pop(0)
-            self._text.insert(tk.END, data + '\n', color)
-            if self._check_btn_v.get():
-                self._text.see(tk.END)
+        if not self._have_data:
+            return
+        # all the pending lines in one insert, then drop the oldest lines over the history
+        chunks = []
+        for data, color in self._data:
+            chunks += [data + '\n', color]
+        self._data.clear()
+        self._text.insert(tk.END, *chunks)
+        excess = int(self._text.index('end-1c').split('.')[0]) - 1 - settings.window_history
+        if excess > 0:
+            self._text.delete('1.0', f'{excess + 1}.0')
+        if self._check_btn_v.get():
+            self._text.see(tk.END)
 
     def kill(self):
         self._is_alive = False
+        ping_engine.changed(self)
 
     def _read_start_pos(self):
         if self._host_name in log.start_pos:
@@ -412,6 +527,7 @@ class EditRow:
     def _edit_cmd(self):
         if self._valid_data:
             self._line.host_name, self._line.ip_address = self._name_input.value, self._ip_input.value
+            self._line.refresh()
             self._my_window.destroy()
 
 
@@ -446,7 +562,7 @@ class SettingsWindow:
             self._value_frame.grid_rowconfigure(i, weight=1)
 
             Text(self._param_frame, key, (i, 0)).draw(padx=2, pady=2, sticky=tk.EW)
-            if key in [Config.LOG_IGNORE_DOCK]:
+            if key in [Config.LOG_IGNORE_DOCK, Config.KERNEL_FILTER, Config.ADAPTIVE_TIMEOUT, Config.VIRTUAL_TABLE]:
                 param_value = BoolInputBox(self._value_frame, str(bool(value)), (i, 0))
             else:
                 from_, to = RANGE_OF_SETTINGS[key]
@@ -527,11 +643,15 @@ class AutoInsertWin:
         for box in self._end_ip:
             box.draw(sticky=tk.EW, padx=2, pady=2)
 
+        self._ranges = Inputbox(self._main_frame, 'or: 10.1.0.0/20, 10.2.0.1-10.2.3.255, !10.1.2.0/24', (3, 0))
+        self._ranges.draw(sticky=tk.EW, columnspan=4, padx=2, pady=2)
+
         self._buttons_frame = tk.Frame(self._my_window)
         self._buttons_frame.grid(row=1, column=0, sticky=tk.NSEW)
         self._buttons_frame.grid_columnconfigure(0, weight=1)
         self._buttons_frame.grid_columnconfigure(1, weight=1)
         self._buttons_frame.grid_columnconfigure(2, weight=1)
+        self._buttons_frame.grid_columnconfigure(3, weight=1)
 
         self._cancel_btn = Button(self._buttons_frame, 'cancel', (0, 0), self._close_cmd)
         self._cancel_btn.draw(sticky=tk.EW)
@@ -543,6 +663,11 @@ class AutoInsertWin:
         self._table_menu.current(0)
         self._table_menu.grid(row=0, column=2, sticky=tk.NSEW)
 
+        self._live_only_v = tk.IntVar()
+        self._live_only = tk.Checkbutton(self._buttons_frame, text='only live hosts', variable=self._live_only_v)
+        self._live_only.select()
+        self._live_only.grid(row=0, column=3, sticky=tk.NSEW)
+
     def focus_set(self):
         self._my_window.focus_set()
 
@@ -551,9 +676,15 @@ class AutoInsertWin:
         self._my_window.destroy()
 
     def _submit_cmd(self, *_):
-        self._menu.auto_insert([item.value for item in self._start_ip],
-                               [item.value for item in self._end_ip],
-                               self._index)
+        if self._ranges.changed and self._ranges.value:
+            try:
+                ips = IpRanges(self._ranges.value)
+            except ValueError:
+                msgbox.showerror('Error!', 'Invalid IP Range!')
+                return
+        else:
+            ips = OctetRanges([item.value for item in self._start_ip], [item.value for item in self._end_ip])
+        self._menu.auto_insert(ips, self._index, bool(self._live_only_v.get()))
         self._close_cmd()
 
     @property
@@ -666,7 +797,11 @@ class AddDataFrame:
 
     def _submit_func(self):
         if self._valid_data:
-            self._tables[self._index].add((self._name_input.value, self._ip_input.value))
+            try:
+                self._tables[self._index].add((self._name_input.value, self._ip_input.value))
+            except RuntimeError as e:
+                msgbox.showerror('Error!', f'can\'t add the row! {e}')
+                return
             self._master.focus_set()
             self._name_input.reset_text()
             self._ip_input.reset_text()
@@ -761,6 +896,10 @@ class Menu:
                     for item in content:
                         if len(item) != 2:
                             raise ValueError
+                    capacity = ping_engine.capacity
+                    if capacity is not None and len(content) > capacity:
+                        # checked before the tables are cleared, so the open tables stay as they are
+                        raise ValueError(f'{len(content)} rows, at most {capacity} can be pinged')
                     for table in self._tables:
                         table.reset()
                     settings.reset_adder()
@@ -822,12 +961,52 @@ class Menu:
             self._auto_insert_win = AutoInsertWin(self._master, self, len(self._tables))
         self._auto_insert_win.focus_set()
 
-    def auto_insert(self, start_ip, end_ip, table_index):
-        for a in range(start_ip[0], end_ip[0] + 1):
-            for b in range(start_ip[1], end_ip[1] + 1):
-                for c in range(start_ip[2], end_ip[2] + 1):
-                    for d in range(start_ip[3], end_ip[3] + 1):
-                        self._tables[table_index].add(('auto', f'{a}.{b}.{c}.{d}'))
+    def auto_insert(self, ips, table_index, live_only=False):
+        """add the addresses of ips (IpRanges or OctetRanges), or only the ones answering a sweep with live_only"""
+        if live_only:
+            # the sweep shares the packet rate cap with the ping engine
+            sweep = RangeSweep(ips, ping_engine.rate_limit, settings.ping_timeout, settings.ping_buffer_size,
+                               use_datagram_sockets(settings.socket_type), len(ips))
+            sweep.start()
+            self._master.after(SWEEP_POLL_INTERVAL, self._check_sweep, sweep, table_index)
+        else:
+            self._insert_chunk(iter(ips), table_index, 0, len(ips))
+
+    def _insert_chunk(self, ips, table_index, inserted, total):
+        # a chunk at a time, so the window keeps responding while a large range is added
+        table = self._tables[table_index % len(self._tables)]
+        chunk = list(itertools.islice(ips, AUTO_INSERT_CHUNK))
+        try:
+            for ip in chunk:
+                table.add(('auto', ip))
+        except RuntimeError as e:
+            self._reset_title()
+            msgbox.showerror('Error!', f'can\'t add the rows! {e}')
+            return
+        inserted += len(chunk)
+        if len(chunk) == AUTO_INSERT_CHUNK:
+            self._master.title(f'auto insert: {inserted}/{total} added')
+            self._master.after(1, self._insert_chunk, ips, table_index, inserted, total)
+        else:
+            self._reset_title()
+
+    def _reset_title(self):
+        if self._file_name:
+            self._set_title()
+        else:
+            self._master.title(DEF_SCREEN_TITLE)
+
+    def _check_sweep(self, sweep: RangeSweep, table_index):
+        if not sweep.done:
+            self._master.title(f'auto insert: {sweep.sent}/{sweep.total} sent')
+            self._master.after(SWEEP_POLL_INTERVAL, self._check_sweep, sweep, table_index)
+            return
+        self._reset_title()
+        if sweep.error:
+            msgbox.showerror('Error!', f'can\'t sweep the range! {sweep.error}')
+            return
+        responders = sweep.responders
+        self._insert_chunk(iter(responders), table_index, 0, len(responders))
 
     def log_win_closed(self):
         self._log_win = None
@@ -864,33 +1043,154 @@ def valid_ip(ip):
         return False
 
 
-def pinger_thread(table_line: PingTableLine, identifier):
-    ip = table_line.ip_address
-    ping_socket = PingSocket(ip, identifier)
-    while settings.running and table_line.is_alive:
-        start_time = datetime.datetime.now()
-        if table_line.pause:
-            time.sleep(settings.ping_sleep_timer / 1000)
-            table_line.update_line(Color.GRAY)
-            continue
-        ping_socket.ip = table_line.ip_address
-        ping_socket.send(settings.ping_buffer_size, settings.ping_ttl, settings.ping_timeout)
-        answer, rtt = ping_socket.receive()
-        if rtt:
-            if rtt < settings.min_threshold:
-                color = Color.YELLOW
-            elif rtt < settings.max_threshold:
-                color = Color.GREEN
+class PendingUpdate:
+    """
+    the results of one row since its last frame, coalesced: the passed and failed results are counted, only the
+    last colors are kept, and the lines for the detail window only while it is open and up to its history
+    """
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.colors: Deque[COLOR] = collections.deque(maxlen=COLOR_CHANGE_RESULTS)
+        self.lines: Deque[Tuple[float, str, COLOR]] = collections.deque(maxlen=settings.window_history)
+        # a ShardedPingEngine stored results of the row, read when it is applied
+        self.stored = False
+
+    def add(self, kind, answer, rtt, window_open):
+        if kind == UPDATE_REPLY:
+            color = PingTableLine.reply_color(rtt)
+            if color in [Color.GREEN, Color.ORANGE]:
+                self.passed += 1
             else:
-                color = Color.ORANGE
-            # color = Color.YELLOW if rtt < settings.min_threshold else Color.GREEN
-        else:
-            color = Color.RED
-        time_str = datetime.datetime.now().strftime('%d.%m.%Y %H:%M:%S')
-        table_line.add_data(f'{time_str} -> {answer}', color)
-        table_line.update_line(color)
-        to_sleep = max(settings.ping_sleep_timer / 1000 - (datetime.datetime.now() - start_time).total_seconds(), 0)
-        time.sleep(to_sleep)
+                self.failed += 1
+            self.colors.append(color)
+            if window_open:
+                self.lines.append((time.time(), answer, color))
+        elif kind == UPDATE_LATE_REPLY:
+            if window_open:
+                self.lines.append((time.time(), f'{answer} (late)', Color.GRAY))
+        elif kind == UPDATE_PAUSE:
+            self.colors.append(Color.GRAY)
+        elif kind == UPDATE_STORED:
+            self.stored = True
+
+
+class UpdateQueue:
+    """
+    the results reported by the ping threads, coalesced per row: the threads add every result to the
+    PendingUpdate of its row, the gui thread applies the pending rows in frames of at most GUI_FRAME_BUDGET ms
+    and redraws each of them once. a row is pending at most once, so however fast the results come the queue
+    holds at most one update per row and a frame always shows the latest results
+    """
+    def __init__(self):
+        self._pending: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._root = None
+
+    def put(self, line, kind, answer=None, rtt=0):
+        with self._lock:
+            update = self._pending.get(line)
+            if update is None:
+                update = self._pending[line] = PendingUpdate()
+            update.add(kind, answer, rtt, line.window_open)
+
+    def start(self, root):
+        self._root = root
+        root.after(0, self._drain)
+
+    def _drain(self):
+        deadline = time.perf_counter() + GUI_FRAME_BUDGET / 1000
+        while time.perf_counter() < deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+                # the rows are applied in the order they became pending
+                line, update = self._pending.popitem(last=False)
+            if line.is_alive:
+                line.apply(update)
+                line.refresh_row()
+        self._root.after(GUI_REFRESH_INTERVAL, self._drain)
+
+
+class IpRanges:
+    """
+    the addresses of a text of comma separated items, each one a.b.c.d, a.b.c.d/n or a.b.c.d-e.f.g.h.
+    items starting with ! are excluded. the addresses are generated lazily in ascending order,
+    raises ValueError for an invalid item
+    """
+    def __init__(self, text):
+        included, excluded = [], []
+        for item in text.replace(' ', '').split(','):
+            if not item:
+                continue
+            ranges = excluded if item.startswith('!') else included
+            ranges.append(self._parse(item.lstrip('!')))
+        if not included:
+            raise ValueError('no address')
+        self._ranges = self._subtract(self._merge(included), self._merge(excluded))
+
+    @staticmethod
+    def _parse(item):
+        """return (first, last) of an item, as integers"""
+        if '/' in item:
+            network = ipaddress.IPv4Network(item, strict=False)
+            return int(network.network_address), int(network.broadcast_address)
+        first, _, last = item.partition('-')
+        first = int(ipaddress.IPv4Address(first))
+        last = int(ipaddress.IPv4Address(last)) if last else first
+        if last < first:
+            raise ValueError(f'empty range {item}')
+        return first, last
+
+    @staticmethod
+    def _merge(ranges):
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        return merged
+
+    @staticmethod
+    def _subtract(ranges, excluded):
+        result = []
+        for first, last in ranges:
+            for excluded_first, excluded_last in excluded:
+                if excluded_last < first or excluded_first > last:
+                    continue
+                if excluded_first > first:
+                    result.append((first, excluded_first - 1))
+                first = excluded_last + 1
+                if first > last:
+                    break
+            if first <= last:
+                result.append((first, last))
+        return result
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in self._ranges)
+
+    def __iter__(self):
+        for first, last in self._ranges:
+            for address in range(first, last + 1):
+                yield str(ipaddress.IPv4Address(address))
+
+
+class OctetRanges:
+    """the addresses of the per octet ranges of auto insert, start[i] to end[i] in every octet, generated lazily"""
+    def __init__(self, start, end):
+        self._octets = [range(first, last + 1) for first, last in zip(start, end)]
+
+    def __len__(self):
+        total = 1
+        for octet in self._octets:
+            total *= len(octet)
+        return total
+
+    def __iter__(self):
+        for address in itertools.product(*self._octets):
+            yield '.'.join(map(str, address))
 
 
 def ask_for_save(tables, main_menu):
@@ -915,3 +1215,8 @@ def check_keyboard(key_event: tk.Event):
         if (state & value) != 0:
             active_keys[key] = True
     return active_keys
+
+
+updates = UpdateQueue()
+# the number of processes is read once, it takes effect on the next start
+ping_engine = ShardedPingEngine(settings, settings.ping_processes) if settings.ping_processes else PingEngine(settings)
@@ -100,7 +100,12 @@ class Inputbox(Text):
 
 
 class Table:
-    def __init__(self, master: tk.PanedWindow, titles, pos):
+    """
+    the rows live in plain python structures (order, values and tags by iid, selection), the treeview only
+    shows them. with virtual set only the rows in the viewport, plus VIRTUAL_MARGIN, are items of the treeview
+    and the scrollbar moves the window over the rows, so the number of rows does not slow the treeview down
+    """
+    def __init__(self, master: tk.PanedWindow, titles, pos, virtual=False):
         row, column = pos
         # make table resizable
         master.grid_rowconfigure(row, weight=1)
@@ -110,6 +115,17 @@ class Table:
         master.add(self._frame, stretch='always')
         self._frame.grid_columnconfigure(0, weight=1)
         self._frame.grid_rowconfigure(0, weight=1)
+        # rows model
+        self._virtual = virtual
+        self._rows: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._values: Dict[str, list] = {}
+        self._tags: Dict[str, list] = {}
+        self._selected: Set[str] = set()
+        self._next_iid = 0
+        self._offset = 0
+        self._visible = 1
+        self._window: List[str] = []
         # create tree
         self._titles = titles
         self._tree = ttk.Treeview(self._frame, columns=titles, show='headings')
@@ -118,15 +134,23 @@ class Table:
             self._tree.column(column, anchor='e', minwidth=1)
         self._tree.grid(row=0, column=0, sticky=tk.NSEW)
         # add a scrollbar
-        self._scrollbar = ttk.Scrollbar(self._frame, orient=tk.VERTICAL, command=self._tree.yview)
-        self._tree.configure(yscrollcommand=self._scrollbar.set)
+        if virtual:
+            self._scrollbar = ttk.Scrollbar(self._frame, orient=tk.VERTICAL, command=self._yview)
+            self._tree.bind('<Configure>', lambda e: self._render())
+            self._tree.bind('<MouseWheel>', self._wheel)
+            self._tree.bind('<Button-4>', self._wheel)
+            self._tree.bind('<Button-5>', self._wheel)
+        else:
+            self._scrollbar = ttk.Scrollbar(self._frame, orient=tk.VERTICAL, command=self._tree.yview)
+            self._tree.configure(yscrollcommand=self._scrollbar.set)
         self._scrollbar.grid(row=0, column=1, sticky='ns')
+        self._tree.bind('<<TreeviewSelect>>', self._tree_selected)
         self._menu = tk.Menu(self._frame, tearoff=False)
         self._menu.add_command(label='remove', command=self._remove_cmd)
         self._menu.add_command(label='forward', command=self._forward_cmd)
         self._menu.add_command(label='backward', command=self._backward_cmd)
         self._tree.bind('<Button-3>', self._popup_menu)
-        self._tree.bind('<FocusOut>', lambda e: self._tree.selection_set([]))
+        self._tree.bind('<FocusOut>', lambda e: self.selection_set([]))
         self._have_changed = False
         self._master.after(0, self.set_size)
 
@@ -145,11 +169,109 @@ class Table:
 
     @property
     def children(self):
-        return self._tree.get_children()
+        return tuple(self._rows)
 
     @property
     def selection(self):
-        return self._tree.selection()
+        return tuple(sorted(self._selected, key=self._positions.__getitem__))
+
+    def selection_set(self, iids):
+        if isinstance(iids, str):
+            iids = [iids]
+        self._selected = set(iids)
+        self._show_selection()
+
+    def see(self, iid):
+        if not self._virtual:
+            self._tree.see(iid)
+            return
+        position = self._positions[iid]
+        if position < self._offset:
+            self._scroll_to(position)
+        elif position >= self._offset + self._visible:
+            self._scroll_to(position - self._visible + 1)
+
+    def set_row(self, iid, values, tags=()):
+        self._values[iid] = list(values)
+        self._tags[iid] = list(tags)
+        if not self._virtual or iid in self._window:
+            self._tree.item(iid, values=self._values[iid], tags=self._tags[iid])
+
+    def remove(self, *iids):
+        removed = set(iids)
+        self._rows = [iid for iid in self._rows if iid not in removed]
+        self._positions = {iid: i for i, iid in enumerate(self._rows)}
+        for iid in removed:
+            del self._values[iid], self._tags[iid]
+        self._selected -= removed
+        if self._virtual:
+            self._render()
+        else:
+            self._tree.delete(*iids)
+
+    def _visible_rows(self):
+        """the rows that fit entirely below the heading of the treeview"""
+        # the window is always shown from its first row, its box gives the top of the rows and their height
+        bbox = self._tree.bbox(self._window[0]) if self._window else ''
+        if bbox:
+            _, top, _, row_height = bbox
+        else:
+            try:
+                row_height = int(ttk.Style().lookup('Treeview', 'rowheight'))
+            except (ValueError, tk.TclError):
+                row_height = settings.text_size * 2
+            # nothing is drawn yet, the heading is about a row high
+            top = row_height
+        return max((self._tree.winfo_height() - top) // max(row_height, 1), 1)
+
+    def _render(self):
+        """make the items of the treeview the rows of the window"""
+        self._visible = self._visible_rows()
+        self._offset = max(min(self._offset, len(self._rows) - self._visible), 0)
+        window = self._rows[self._offset:self._offset + self._visible + VIRTUAL_MARGIN]
+        if window != self._window:
+            self._tree.delete(*self._window)
+            for iid in window:
+                self._tree.insert('', tk.END, iid=iid, values=self._values[iid], tags=self._tags[iid])
+            self._window = window
+            self._tree.yview_moveto(0)
+            self._show_selection()
+        self._set_scrollbar()
+
+    def _set_scrollbar(self):
+        if self._rows:
+            self._scrollbar.set(self._offset / len(self._rows),
+                                min((self._offset + self._visible) / len(self._rows), 1))
+        else:
+            self._scrollbar.set(0, 1)
+
+    def _show_selection(self):
+        shown = [iid for iid in (self._window if self._virtual else self._rows) if iid in self._selected]
+        if set(shown) != set(self._tree.selection()):
+            self._tree.selection_set(shown)
+
+    def _tree_selected(self, _):
+        # a click selects rows of the window, the selected rows outside of it stay selected
+        shown = set(self._window if self._virtual else self._rows)
+        self._selected = (self._selected - shown) | set(self._tree.selection())
+
+    def _scroll_to(self, offset):
+        self._offset = offset
+        self._render()
+
+    def _yview(self, *args):
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * len(self._rows)))
+        elif args[0] == 'scroll':
+            step = self._visible if args[2] == 'pages' else 1
+            self._scroll_to(self._offset + int(args[1]) * step)
+
+    def _wheel(self, event: tk.Event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(max(self._offset - WHEEL_ROWS, 0))
+        else:
+            self._scroll_to(self._offset + WHEEL_ROWS)
+        return 'break'
 
     def _popup_menu(self, event):
         iids = self.selection
@@ -160,18 +282,15 @@ class Table:
         self._menu.tk_popup(event.x_root, event.y_root)
 
     def _remove_cmd(self):
-        for iid in self.selection:
-            self._tree.delete(iid)
+        self.remove(*self.selection)
 
     def _switch_pos(self, first, second):
-        children = self.children
-        first_row, second_row = self._tree.item(first), self._tree.item(second)
-        first_value, first_tag = first_row['values'], first_row['tags']
-        second_value, second_tag = second_row['values'], second_row['tags']
-        self._tree.delete(first)
-        self._tree.insert('', children.index(first), iid=first, values=second_value, tags=second_tag)
-        self._tree.delete(second)
-        self._tree.insert('', children.index(second), iid=second, values=first_value, tags=first_tag)
+        # the rows keep their place, their values and tags are swapped
+        self._values[first], self._values[second] = self._values[second], self._values[first]
+        self._tags[first], self._tags[second] = self._tags[second], self._tags[first]
+        for iid in (first, second):
+            if not self._virtual or iid in self._window:
+                self._tree.item(iid, values=self._values[iid], tags=self._tags[iid])
 
     def _forward_cmd(self):
         iids = self.selection
@@ -180,11 +299,10 @@ class Table:
         if iids:
             self._have_changed = True
         for iid in iids:
-            for i, child in enumerate(children):
-                if iid == child:
-                    new.append(children[i - 1])
-                    self._switch_pos(child, children[i - 1])
-        self._tree.selection_set(new)
+            i = self._positions[iid]
+            new.append(children[i - 1])
+            self._switch_pos(iid, children[i - 1])
+        self.selection_set(new)
 
     def _backward_cmd(self):
         iids = self.selection[::-1]
@@ -193,14 +311,25 @@ class Table:
         if iids:
             self._have_changed = True
         for iid in iids:
-            for i, child in enumerate(children):
-                if iid == child:
-                    new.append(children[i + 1])
-                    self._switch_pos(child, children[i + 1])
-        self._tree.selection_set(new)
-
-    def add(self, line):
-        return self._tree.insert('', tk.END, values=line)
+            i = self._positions[iid]
+            new.append(children[i + 1])
+            self._switch_pos(iid, children[i + 1])
+        self.selection_set(new)
+
+    def add(self, line, tags=()):
+        iid = f'R{self._next_iid}'
+        self._next_iid += 1
+        self._positions[iid] = len(self._rows)
+        self._rows.append(iid)
+        self._values[iid] = list(line)
+        self._tags[iid] = list(tags)
+        if not self._virtual:
+            self._tree.insert('', tk.END, iid=iid, values=line, tags=tags)
+        elif len(self._window) < self._visible + VIRTUAL_MARGIN:
+            self._render()
+        else:
+            self._set_scrollbar()
+        return iid
 
     def delete(self):
         self._master.remove(self._frame)
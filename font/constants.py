@@ -3,3 +3,6 @@ DEF_TEXT_BG_COLOR = None
 SCREEN_SIZE = '1000x500'
 DEF_SCREEN_TITLE = 'Untitled - Pinger++'
 SELECTED_COLOR = '#0078d7'
+# virtual tables, rows kept as treeview items past the viewport and rows scrolled by a mouse wheel step
+VIRTUAL_MARGIN = 2
+WHEEL_ROWS = 3
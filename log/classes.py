@@ -11,6 +11,8 @@ class LogFile:
         self._changed = False
         self._times: List[datetime.datetime] = []
         self._lines: List[Tuple[str, str]] = []
+        # the reshaped lines of get_string_rtl, a prefix of the lines, only the new lines are reshaped
+        self._rtl_lines: List[str] = []
         self._read_log()
         self.add('מערכת', 'מתחיל')
         self._start = None
@@ -45,6 +47,8 @@ class LogFile:
         while self._times and (current_time - self._times[0]).total_seconds() / 3600 > settings.log_save:
             self._times.pop(0)
             self._lines.pop(0)
+            if self._rtl_lines:
+                self._rtl_lines.pop(0)
             self._changed = True
         # rewrite file if needed
         if self.changed:
@@ -77,12 +81,11 @@ class LogFile:
         return log_str
 
     def get_string_rtl(self):
-        log_str = ''
-        for i in range(len(self._times)):
+        for i in range(len(self._rtl_lines), len(self._times)):
             sub, con = self._lines[i]
-            new_line = f'זמן: {self._times[i].strftime("%d.%m.%Y %H:%M:%S")} - {sub} - {con}\n'
-            log_str += new_line
-        return hebrew_reshaper(log_str)
+            new_line = f'זמן: {self._times[i].strftime("%d.%m.%Y %H:%M:%S")} - {sub} - {con}'
+            self._rtl_lines.append(hebrew_reshaper(new_line))
+        return ''.join([line + '\n' for line in self._rtl_lines])
 
     def _get_start_from_log(self):
         log_content = {}
@@ -13,8 +13,7 @@ import sys
 def do_quit(root, tables, main_menu):
     if ask_for_save(tables, main_menu):
         settings.running = False
-        for table in tables:
-            table.join()
+        ping_engine.join()
         root.destroy()
 
 
@@ -40,6 +39,7 @@ def main():
     tables_pd.grid(row=1, column=0, sticky=tk.NSEW)
     for i in range(settings.num_of_tables):
         tables.append(PingTable(tables_pd, (1, i), tables, i))
+    updates.start(root)
     add_data_frame = AddDataFrame(root, (0, 0), tables)
     main_menu = Menu(root, tables, tables_pd, add_data_frame)
     if len(sys.argv) != 1:
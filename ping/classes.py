@@ -1,9 +1,29 @@
 import time
 from .constants import *
+from typing import *
+import array
+import asyncio
+import collections
+import ctypes
+import errno
+import functools
+import heapq
+import itertools
+import multiprocessing
+import multiprocessing.shared_memory
+import queue
+import math
+import os
 import socket
 import struct
-import datetime
-import select
+import selectors
+import sys
+import threading
+import zlib
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class PingSocket:
@@ -12,8 +32,14 @@ class PingSocket:
         self._ip = ip
         self._identifier = identifier
         self._sequence = 0
-        self._start_time = datetime.datetime.now()
+        self._start_time = time.monotonic()
+        self._start_ns = time.perf_counter_ns()
+        self._timeout = 0
+        self._template: Optional[PacketTemplate] = None
         self._packet = None
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._socket, selectors.EVENT_READ)
 
     @property
     def ip(self):
@@ -24,69 +50,1595 @@ class PingSocket:
         if ip != self._ip:
             self._ip = ip
 
+    @property
+    def _remaining(self):
+        return self._start_time + self._timeout - time.monotonic()
+
     @property
     def is_timeout(self):
-        return (datetime.datetime.now() - self._start_time).total_seconds() > self._socket.gettimeout()
+        return self._remaining <= 0
 
     @staticmethod
     def cal_checksum(data):
-        checksum = 0
-        num_words = len(data) // 2
-        for i in range(num_words):
-            word = (data[i * 2] << 8) + data[i * 2 + 1]
-            checksum += word
-        checksum = (checksum >> 16) + (checksum & 0xffff)
+        """internet checksum of data, an odd trailing byte is padded with zero"""
+        if len(data) % 2:
+            data = bytes(data) + b'\0'
+        if numpy is not None and len(data) >= NUMPY_CHECKSUM_SIZE:
+            checksum = int(numpy.frombuffer(data, dtype='>u2').sum(dtype=numpy.uint64))
+            while checksum >> 16:
+                checksum = (checksum & 0xffff) + (checksum >> 16)
+        else:
+            # 2 ** 16 = 1 (mod 0xffff), so the data as one big number has the same ones' complement sum as its words
+            number = int.from_bytes(data, 'big')
+            checksum = number % 0xffff
+            if checksum == 0 and number:
+                checksum = 0xffff
         return ~checksum & 0xffff
 
-    def _get_header(self, checksum=0):
-        return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, self._identifier, self._sequence)
-
     def _get_packet(self, count):
         self._sequence = (self._sequence + 1) % 2 ** 16
-        header = self._get_header()
-        payload = bytes(bytearray([i % 256 for i in range(count)]))
-        checksum = self.cal_checksum(header + payload)
-        header = self._get_header(checksum)
-        return header + payload
+        if self._template is None or self._template.count != count:
+            self._template = PacketTemplate(self._identifier, count)
+        return self._template.packet(self._sequence)
 
     def send(self, buffer_size=32, ttl=128, timeout=4000):
-        self._socket.settimeout(timeout / 1000)
+        self._timeout = timeout / 1000
         self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
         self._packet = self._get_packet(buffer_size)
         self._socket.sendto(self._packet, (self._ip, 0))
-        self._start_time = datetime.datetime.now()
+        self._start_time = time.monotonic()
+        self._start_ns = time.perf_counter_ns()
 
     def receive(self):
-        answer = None
-        while not answer:
-            response = None
-            while not (self.is_timeout or response):
-                r, _, _ = select.select([self._socket], [], [], 0)
-                if r:
-                    response, src_ip = self._socket.recvfrom(2**16)
-                    response_identifier, response_sequence = struct.unpack('!HH', response[24:28])
-                    rtt = int((datetime.datetime.now() - self._start_time).total_seconds() * 1000) + 1
-                    response_type = response[20]
-                    ttl = struct.unpack('!B', response[8:9])[0]
-                    if response_identifier != self._identifier or response_sequence != self._sequence:
-                        continue
-                    if response_type == 0:
-                        answer = (f'Reply from {src_ip[0]}: bytes={len(self._packet)} time={rtt}ms TTL={ttl}', rtt)
-                    elif response_type == 3:
-                        answer = (f'Reply from {src_ip[0]}: Destination host unreachable.', 0)
-                    elif response_type == 11:
-                        answer = (f'Reply from {src_ip[0]}: TTL expired in transit.', 0)
-                    else:
-                        answer = ('Unknown response.', 0)
+        # block until the socket is readable or the timeout expires instead of polling
+        while not self.is_timeout:
+            if not self._selector.select(self._remaining):
+                continue
+            size, src_ip = self._socket.recvfrom_into(self._buffer)
+            rtt = round_rtt(time.perf_counter_ns() - self._start_ns)
+            reply = parse_reply(self._buffer, size)
+            if not reply:
+                continue
+            response_type, response_identifier, response_sequence, ttl = reply
+            if response_identifier != self._identifier or response_sequence != self._sequence:
+                continue
+            return reply_answer(response_type, src_ip[0], len(self._packet), rtt, ttl)
+        return 'Request timed out.', 0
+
+    def close(self):
+        self._selector.close()
+        self._socket.close()
+
+
+def open_raw_socket():
+    icmp_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    icmp_socket.setblocking(False)
+    # every reply of a burst of probes lands on this one socket, give it room
+    icmp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    return icmp_socket
+
+
+def ping_sockets_allowed():
+    """True when net.ipv4.ping_group_range lets this process open unprivileged (SOCK_DGRAM) icmp sockets"""
+    try:
+        with open(PING_GROUP_RANGE_FILE, 'r') as range_file:
+            low, high = (int(value) for value in range_file.read().split())
+    except (OSError, ValueError):
+        return False
+    return any(low <= group <= high for group in {os.getgid(), *os.getgroups()})
+
+
+def open_datagram_socket(identifier):
+    """
+    unprivileged icmp socket bound to identifier: the kernel writes the identifier and the checksum of every
+    request sent and delivers only the replies (and, with IP_RECVERR, the errors) belonging to this socket
+    """
+    icmp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    try:
+        icmp_socket.setblocking(False)
+        icmp_socket.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        icmp_socket.setsockopt(socket.IPPROTO_IP, IP_RECVTTL, 1)
+        icmp_socket.bind(('', identifier))
+    except OSError:
+        icmp_socket.close()
+        raise
+    return icmp_socket
+
+
+def use_datagram_sockets(socket_type):
+    """True when socket_type (SOCKET_AUTO, SOCKET_RAW or SOCKET_DATAGRAM) means pinging with datagram sockets"""
+    if socket_type == SOCKET_AUTO:
+        return ping_sockets_allowed()
+    return socket_type == SOCKET_DATAGRAM
+
+
+@functools.lru_cache(maxsize=PAYLOAD_CACHE_SIZE)
+def get_payload(count):
+    return (PAYLOAD_PATTERN * (count // len(PAYLOAD_PATTERN) + 1))[:count]
+
+
+def update_checksum(checksum, old_word, new_word):
+    """RFC 1624 incremental update of a checksum after one 16 bit word changed: HC' = ~(~HC + ~m + m')"""
+    total = (~checksum & 0xffff) + (~old_word & 0xffff) + new_word
+    total = (total & 0xffff) + (total >> 16)
+    total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def kernel_timestamp(ancdata):
+    """receive time (ns since the epoch) from the SO_TIMESTAMPNS control message, None without one"""
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= TIMESPEC.size:
+            seconds, nanoseconds = TIMESPEC.unpack_from(data)
+            return seconds * 10 ** 9 + nanoseconds
+    return None
+
+
+def round_rtt(rtt_ns):
+    """rtt in microseconds, at least 1 since 0 means no reply"""
+    return max(rtt_ns // 1000, 1)
+
+
+def receive_datagram(icmp_socket, buffer):
+    """
+    read one packet from a datagram icmp socket, return (type, sequence, ttl, src_ip, kernel timestamp) or None
+    when there is nothing left to read. the error queue is read first, it returns our own request and the
+    error about it
+    """
+    while True:
+        try:
+            size, ancdata, _, _ = icmp_socket.recvmsg_into([buffer], ANCILLARY_SIZE, socket.MSG_ERRQUEUE)
+        except (BlockingIOError, InterruptedError):
+            pass
+        else:
+            for level, kind, data in ancdata:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(data) < SOCK_EXTENDED_ERR_SIZE + 8:
+                    continue
+                origin, error_type = data[4], data[5]
+                if origin == SO_EE_ORIGIN_ICMP and error_type in ICMP_ERRORS and size >= ICMP_HEADER_SIZE:
+                    offender = socket.inet_ntoa(data[SOCK_EXTENDED_ERR_SIZE + 4:SOCK_EXTENDED_ERR_SIZE + 8])
+                    return error_type, ICMP_SEQUENCE.unpack_from(buffer, 6)[0], 0, offender, kernel_timestamp(ancdata)
+            continue
+        try:
+            size, ancdata, _, address = icmp_socket.recvmsg_into([buffer], ANCILLARY_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            # a pending error is reported here first, its details are in the error queue
+            continue
+        if size < ICMP_HEADER_SIZE or buffer[0] != ICMP_ECHO_REPLY:
+            continue
+        ttl = 0
+        for level, kind, data in ancdata:
+            if level == socket.IPPROTO_IP and kind == socket.IP_TTL:
+                ttl = int.from_bytes(data[:4], sys.byteorder)
+        return ICMP_ECHO_REPLY, ICMP_SEQUENCE.unpack_from(buffer, 6)[0], ttl, address[0], kernel_timestamp(ancdata)
+
+
+class PacketTemplate:
+    """
+    echo request of one identifier and payload size. the payload and its checksum are computed once,
+    only the sequence changes between packets so the checksum is updated incrementally
+    """
+    def __init__(self, identifier, count):
+        self._identifier = identifier
+        self._count = count
+        self._payload = get_payload(count)
+        self._sequence = 0
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, identifier, self._sequence)
+        self._checksum = PingSocket.cal_checksum(header + self._payload)
+
+    @property
+    def count(self):
+        return self._count
+
+    def packet(self, sequence):
+        self._checksum = update_checksum(self._checksum, self._sequence, sequence)
+        self._sequence = sequence
+        return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, self._checksum, self._identifier, sequence) + self._payload
+
+
+def attach_filter(icmp_socket, first, last):
+    """
+    attach a classic bpf program to a raw icmp socket so the kernel only passes echo replies, and errors
+    about echo requests, whose identifier is in [first, last]. return False where it is not supported
+    """
+    drop = 16
+    program = [
+        (BPF_LDX_B_MSH, 0, 0, 0),                   # 0: x = outer ip header length
+        (BPF_LD_B_IND, 0, 0, 0),                    # 1: a = icmp type
+        (BPF_JMP_JEQ_K, 12 - 3, 0, ICMP_ECHO_REPLY),
+        (BPF_JMP_JEQ_K, 5 - 4, 0, ICMP_DEST_UNREACHABLE),
+        (BPF_JMP_JEQ_K, 0, drop - 5, ICMP_TIME_EXCEEDED),
+        (BPF_LD_B_IND, 0, 0, ICMP_HEADER_SIZE),     # 5: quoted ip header length
+        (BPF_ALU_AND_K, 0, 0, 0x0f),
+        (BPF_ALU_LSH_K, 0, 0, 2),
+        (BPF_ALU_ADD_X, 0, 0, 0),
+        (BPF_MISC_TAX, 0, 0, 0),
+        (BPF_LD_H_IND, 0, 0, ICMP_HEADER_SIZE + 4),  # 10: identifier of the quoted echo request
+        (BPF_JMP_JA, 0, 0, 13 - 12),
+        (BPF_LD_H_IND, 0, 0, 4),                    # 12: identifier of the echo reply
+        (BPF_JMP_JGE_K, 0, drop - 14, first),       # 13
+        (BPF_JMP_JGT_K, drop - 15, 0, last),
+        (BPF_RET_K, 0, 0, RECEIVE_BUFFER_SIZE),     # 15: accept
+        (BPF_RET_K, 0, 0, 0),                       # 16: drop
+    ]
+    if not sys.platform.startswith('linux'):
+        return False
+    instructions = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *item) for item in program))
+    fprog = struct.pack('HP', len(program), ctypes.addressof(instructions))
+    try:
+        icmp_socket.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    except OSError:
+        return False
+    return True
+
+
+def detach_filter(icmp_socket):
+    try:
+        icmp_socket.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+    except OSError:
+        pass
+
+
+ICMP_ID_SEQUENCE = struct.Struct('!HH')
+ICMP_SEQUENCE = struct.Struct('!H')
+TIMESPEC = struct.Struct('qq')
+
+
+def parse_reply(response, size=None):
+    """
+    return (type, identifier, sequence, ttl) of an echo reply or of an error about one of our echo requests,
+    None for any other packet (including our own requests, looped back when pinging a local address).
+    response is read in place, only its first size bytes are valid
+    """
+    if size is None:
+        size = len(response)
+    if size < IP_HEADER_SIZE + ICMP_HEADER_SIZE:
+        return None
+    offset = (response[0] & 0x0f) * 4
+    response_type = response[offset]
+    if response_type in ICMP_ERRORS:
+        # the error quotes our ip header and the first 8 bytes of our echo request
+        offset += ICMP_HEADER_SIZE
+        if size < offset + IP_HEADER_SIZE or response[offset + 9] != socket.IPPROTO_ICMP:
+            return None
+        offset += (response[offset] & 0x0f) * 4
+        if size < offset + ICMP_HEADER_SIZE or response[offset] != ICMP_ECHO_REQUEST:
+            return None
+    elif response_type != ICMP_ECHO_REPLY or size < offset + ICMP_HEADER_SIZE:
+        return None
+    response_identifier, response_sequence = ICMP_ID_SEQUENCE.unpack_from(response, offset + 4)
+    return response_type, response_identifier, response_sequence, response[8]
+
+
+def source_address(response):
+    return socket.inet_ntoa(bytes(response[12:16]))
+
+
+def reply_answer(response_type, src_ip, size, rtt, ttl):
+    """the answer line of a reply and its rtt in microseconds (0 when the target did not answer)"""
+    if response_type == ICMP_ECHO_REPLY:
+        return f'Reply from {src_ip}: bytes={size} time={rtt / 1000:.3f}ms TTL={ttl}', rtt
+    elif response_type == ICMP_DEST_UNREACHABLE:
+        return f'Reply from {src_ip}: Destination host unreachable.', 0
+    return f'Reply from {src_ip}: TTL expired in transit.', 0
+
+
+class IdentifierAllocator:
+    """
+    hands out unique icmp identifiers, each with its own 16 bit sequence space, shared by every engine.
+    released identifiers are recycled only after all the fresh ones are used, so late replies to a
+    removed target are unlikely to reach the target that got its identifier
+    """
+    def __init__(self, first=FIRST_IDENTIFIER, last=LAST_IDENTIFIER):
+        self._first = first
+        self._last = last
+        self._next = first
+        self._free: Deque[int] = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def first(self):
+        return self._first
+
+    @property
+    def last(self):
+        return self._last
+
+    @property
+    def highest(self):
+        """highest identifier handed out so far"""
+        return self._next - 1
+
+    def allocate(self):
+        with self._lock:
+            if self._next <= self._last:
+                self._next += 1
+                return self._next - 1
+            if self._free:
+                return self._free.popleft()
+        raise RuntimeError(f'all {self._last - self._first + 1} icmp identifiers are in use')
+
+    def release(self, identifier):
+        with self._lock:
+            if self._first <= identifier <= self._last:
+                self._free.append(identifier)
+
+    def restrict(self, first, last):
+        """hand out only identifiers in [first, last] from now on, the ones handed out before stay theirs"""
+        with self._lock:
+            self._first = first
+            self._last = last
+            self._next = max(self._next, first)
+            self._free = collections.deque(identifier for identifier in self._free if first <= identifier <= last)
+
+
+identifiers = IdentifierAllocator()
+
+
+class PingTarget:
+    def __init__(self, client, phase=0.0):
+        self._client = client
+        self._phase = phase
+        self._slot = -1
+        self._interval = None
+        self._srtt: Optional[float] = None
+        self._rttvar = 0.0
+        self._backoff = 1
+        self._next_send = 0.0
+        # keys of the probes of this target in the in-flight table of its engine
+        self.in_flight: Set[Tuple[int, int]] = set()
+        # the identifier this target shares with other targets, its shared datagram socket with datagram sockets
+        self.group: Optional[IdentifierGroup] = None
+        # the target was over the packet rate limit, its tokens are taken and it is sent when it is next due
+        self.rate_limited = False
+
+    @property
+    def client(self):
+        return self._client
+
+    @property
+    def phase(self):
+        return self._phase
+
+    @property
+    def next_send(self):
+        return self._next_send
+
+    def __lt__(self, other):
+        return self._phase < other.phase
+
+    def add_sample(self, rtt):
+        """update the smoothed rtt and its variance with rtt (seconds) of an answered probe"""
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar = (1 - RTT_BETA) * self._rttvar + RTT_BETA * abs(self._srtt - rtt)
+            self._srtt = (1 - RTT_ALPHA) * self._srtt + RTT_ALPHA * rtt
+        self._backoff = 1
+
+    def add_loss(self):
+        # back off like a tcp retransmission timer until a probe is answered again
+        self._backoff = min(self._backoff * 2, 2 ** 16)
+
+    def timeout(self, max_timeout):
+        """retransmission style timeout (seconds) of the next probe, at most max_timeout"""
+        if self._srtt is None:
+            return max_timeout
+        rto = max(self._srtt + 4 * self._rttvar, ADAPTIVE_MIN_TIMEOUT) * self._backoff
+        return min(rto, max_timeout)
+
+    def schedule(self, now, interval, epoch):
+        """
+        move next_send to the next slot of this target after now. the slots are epoch + (phase + k) * interval,
+        so the target keeps its place in the interval, whether or not the previous probes were answered
+        """
+        if interval != self._interval:
+            self._slot = -1
+            self._interval = interval
+        self._slot = max(self._slot + 1, math.floor((now - epoch) / interval - self._phase) + 1)
+        self._next_send = epoch + (self._slot + self._phase) * interval
+
+
+class TokenBucket:
+    """rate limiter, rate tokens are added every second and up to burst of them are saved up. thread safe"""
+    def __init__(self, rate, burst):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def update(self, rate, burst):
+        with self._lock:
+            self._rate = rate
+            self._burst = burst
+            self._tokens = min(self._tokens, burst)
+
+    def reserve(self, now):
+        """
+        take a token, even from an empty bucket, and return the time it is ready: now, or the time the bucket
+        refills to it, so the k-th token taken from an empty bucket is ready k / rate seconds later
+        """
+        with self._lock:
+            # the threads sharing the bucket may pass their times slightly out of order
+            now = max(now, self._last)
+            self._tokens = min(self._tokens + (now - self._last) * self._rate, self._burst) - 1
+            self._last = now
+            return now + max(-self._tokens, 0) / self._rate
+
+
+class TargetClients:
+    """
+    the clients pinging one address. the address is probed once for all of them and the results fan out:
+    paused clients get on_pause instead of the results, the address is paused only when all of them are
+    """
+    def __init__(self, ip_address):
+        self._ip_address = ip_address
+        self._clients = []
+        self._lock = threading.Lock()
+
+    @property
+    def ip_address(self):
+        return self._ip_address
+
+    @property
+    def pause(self):
+        return all(client.pause for client in self._clients)
+
+    @property
+    def is_alive(self):
+        """drop the dead clients, False once none is left"""
+        with self._lock:
+            self._clients = [client for client in self._clients if client.is_alive]
+            return bool(self._clients)
+
+    def add(self, client):
+        with self._lock:
+            self._clients = self._clients + [client]
+
+    def moved(self):
+        """remove and return the clients whose address was changed"""
+        with self._lock:
+            moved = [client for client in self._clients if client.ip_address != self._ip_address]
+            if moved:
+                self._clients = [client for client in self._clients if client not in moved]
+            return moved
+
+    # dead clients are skipped, they are only dropped when the address is next due
+    def on_reply(self, answer, rtt):
+        for client in self._clients:
+            if not client.is_alive:
+                continue
+            if client.pause:
+                client.on_pause()
+            else:
+                client.on_reply(answer, rtt)
+
+    def on_late_reply(self, answer, rtt):
+        for client in self._clients:
+            if client.is_alive and not client.pause:
+                client.on_late_reply(answer, rtt)
+
+    def on_pause(self):
+        for client in self._clients:
+            if client.is_alive:
+                client.on_pause()
+
+
+class IdentifierGroup:
+    """
+    an icmp identifier of PingEngine, shared by up to IDENTIFIER_TARGETS targets that are told apart by the
+    sequences of their probes, so the 16 bit identifiers do not limit the number of targets
+    """
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.targets = 0
+        self._sequence = 0
+        self._template: Optional[PacketTemplate] = None
+
+    def next_sequence(self, in_flight):
+        """the next sequence no probe in in_flight is using, None if all of them are"""
+        for _ in range(2 ** 16):
+            self._sequence = (self._sequence + 1) % 2 ** 16
+            if (self.identifier, self._sequence) not in in_flight:
+                return self._sequence
+        return None
+
+    def packet(self, count, sequence):
+        if self._template is None or self._template.count != count:
+            self._template = PacketTemplate(self.identifier, count)
+        return self._template.packet(sequence)
+
+
+class DatagramSocket(IdentifierGroup):
+    """
+    a datagram socket of PingEngine, the identifier group of its targets. the kernel writes the identifier
+    the socket is bound to into every request
+    """
+    def __init__(self, icmp_socket, identifier):
+        super(DatagramSocket, self).__init__(identifier)
+        self.socket = icmp_socket
+        self.ttl = None
+
+
+class PingProbe:
+    def __init__(self, target: PingTarget, identifier, sequence, size, sent_time, deadline, sent_ns, sent_wall_ns):
+        self.target = target
+        # the identifier of the group of its target
+        self.identifier = identifier
+        self.sequence = sequence
+        self.size = size
+        self.sent_time = sent_time
+        self.deadline = deadline
+        # perf_counter_ns and time_ns right before the send, for the rtt
+        self.sent_ns = sent_ns
+        self.sent_wall_ns = sent_wall_ns
+        self.timed_out = False
+
+    @property
+    def key(self):
+        return self.identifier, self.sequence
+
+
+class PingEngine:
+    """
+    one raw socket and one thread for all the targets.
+    every probe sent is kept in an in-flight table keyed by its icmp (identifier, sequence) until it is
+    answered or its timeout expires, so several probes per target can be outstanding at once.
+    rtts are measured with perf_counter_ns, or with the kernel receive timestamps (SO_TIMESTAMPNS) when
+    kernel_timestamps is set, so the time the reply waited in the socket is not counted.
+    targets share identifiers, up to IDENTIFIER_TARGETS each (see IdentifierGroup), so the engine is not limited
+    to 2 ** 16 targets. with unprivileged datagram sockets (config.socket_type) every group is a socket of its
+    own, bound to its identifier (see DatagramSocket), all of them waited on by the same thread.
+    allocator hands out the identifiers of the groups, the shared one by default.
+    clients with the same address share one target, so every address is probed once (see TargetClients).
+    targets wait in a heap ordered by their next send time. each one has a fixed phase in the interval, so the
+    probes are spread over the interval instead of all of them being sent in one burst.
+    config.max_packet_rate caps the probes sent a second, and config.subnet_packet_rate the probes sent to
+    each /24, with token buckets. a probe over the limit takes its token in advance and waits in line for it,
+    it is sent late.
+    with config.adaptive_timeout a probe times out after the retransmission timeout of its target, computed
+    from its rtts (PingTarget.timeout), instead of after config.ping_timeout which stays the upper bound
+    """
+    def __init__(self, config, kernel_timestamps=True, allocator=None):
+        self._config = config
+        self._identifiers: IdentifierAllocator = allocator or identifiers
+        self._kernel_timestamps = kernel_timestamps
+        self._socket = None
+        self._selector = selectors.DefaultSelector()
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self._datagram = False
+        self._groups: List[IdentifierGroup] = []
+        self._ttl = None
+        self._filter: Optional[Tuple[int, int]] = None
+        self._targets: Set[PingTarget] = set()
+        self._addresses: Dict[str, PingTarget] = {}
+        self._added = 0
+        self._epoch = time.monotonic()
+        self._schedule: List[Tuple[float, PingTarget]] = []
+        self._rate_limit: Optional[TokenBucket] = None
+        self._subnet_rate_limits: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[Tuple[int, int], PingProbe] = {}
+        self._deadlines: List[Tuple[float, Tuple[int, int]]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def _running(self):
+        return self._config.running
+
+    @property
+    def _interval(self):
+        return self._config.ping_sleep_timer / 1000
+
+    def add(self, client):
+        """
+        start pinging client.ip_address, results are reported by client.on_reply(answer, rtt) (rtt in microseconds),
+        client.on_late_reply(answer, rtt) for replies that arrive after their probe timed out
+        and client.on_pause() while client.pause is set. client is dropped once client.is_alive is False
+        """
+        with self._lock:
+            target = self._addresses.get(client.ip_address)
+            if target is not None:
+                target.client.add(client)
+                return
+            clients = TargetClients(client.ip_address)
+            clients.add(client)
+            target = PingTarget(clients, (self._added * PHASE_STEP) % 1)
+            self._addresses[client.ip_address] = target
+            self._added += 1
+            target.schedule(time.monotonic(), self._interval, self._epoch)
+            self._targets.add(target)
+            heapq.heappush(self._schedule, (target.next_send, target))
+            if self._thread is None:
+                self._datagram = self._use_datagram()
+                if not self._datagram:
+                    self._socket = open_raw_socket()
+                    self._enable_timestamps(self._socket)
+                    self._selector.register(self._socket, selectors.EVENT_READ)
+                self._thread = threading.Thread(target=self._loop)
+                self._thread.start()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def capacity(self):
+        """the most clients the engine pings at once, None without a limit"""
+        return None
+
+    def changed(self, client):
+        """client.pause, client.ip_address or client.is_alive changed, they are read when client is next due"""
+        pass
+
+    @property
+    def rate_limit(self):
+        """the token bucket of config.max_packet_rate, None without a limit. a RangeSweep shares it with the engine"""
+        with self._lock:
+            self._rate_limit = self._bucket(self._rate_limit, self._config.max_packet_rate)
+            return self._rate_limit
+
+    def _enable_timestamps(self, icmp_socket):
+        if self._kernel_timestamps:
+            try:
+                icmp_socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+            except OSError:
+                self._kernel_timestamps = False
+
+    def _use_datagram(self):
+        return use_datagram_sockets(self._config.socket_type)
+
+    def _update_filter(self):
+        if self._socket is None:
+            return
+        if self._config.kernel_filter:
+            last = min((self._identifiers.highest // FILTER_BLOCK + 1) * FILTER_BLOCK, self._identifiers.last)
+            wanted = self._identifiers.first, last
+        else:
+            wanted = None
+        if wanted != self._filter:
+            if wanted is None:
+                detach_filter(self._socket)
+            elif not attach_filter(self._socket, *wanted):
+                wanted = None
+            self._filter = wanted
+
+    def _loop(self):
+        while self._running:
+            self._update_filter()
+            now = time.monotonic()
+            next_event = min(self._send_due(now), self._expire(now))
+            for key, _ in self._selector.select(max(next_event - time.monotonic(), 0)):
+                if key.data is None:
+                    self._receive_all()
                 else:
-                    time.sleep(0.01)
+                    self._receive_datagram(key.data)
+        self._selector.close()
+        if self._socket is not None:
+            self._socket.close()
+        if self._datagram:
+            for shared in self._groups:
+                shared.socket.close()
+
+    def _send_due(self, now):
+        """send every due probe and return the time of the next one"""
+        interval = self._interval
+        due = []
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now + SCHEDULE_TICK:
+                _, target = heapq.heappop(self._schedule)
+                if target not in self._targets:
+                    continue
+                due.append(target)
+        sending = []
+        for target in due:
+            client: TargetClients = target.client
+            for moved in client.moved():
+                self.add(moved)
+            with self._lock:
+                # under the lock, so a client added to this address now gets a new target
+                alive = client.is_alive
+                if not alive:
+                    self._addresses.pop(client.ip_address, None)
+            if not alive:
+                self._remove(target)
+                continue
+            if client.pause:
+                target.rate_limited = False
+                self._reschedule(target, now, interval)
+                client.on_pause()
+            else:
+                sending.append(target)
+        sending = self._limit_rate(sending, now)
+        if sending:
+            self._send(sending)
+        with self._lock:
+            return self._schedule[0][0] if self._schedule else now + interval
+
+    def _reschedule(self, target, now, interval):
+        target.schedule(now, interval, self._epoch)
+        with self._lock:
+            heapq.heappush(self._schedule, (target.next_send, target))
+
+    def _defer(self, target, when):
+        # keep the slot of target, it is sent once its tokens are ready
+        with self._lock:
+            heapq.heappush(self._schedule, (when, target))
+
+    @staticmethod
+    def _bucket(bucket, rate):
+        """the token bucket for rate, created or updated from bucket. None when rate is 0 (no limit)"""
+        if not rate:
+            return None
+        burst = max(rate * RATE_BURST, 1)
+        if bucket is None:
+            return TokenBucket(rate, burst)
+        if bucket.rate != rate:
+            bucket.update(rate, burst)
+        return bucket
+
+    def _limit_rate(self, targets, now):
+        """
+        return the targets that may be sent now. the others take their tokens in advance and are deferred until
+        they are ready, so the targets over the limit wait in line 1 / rate apart and each token is handled once
+        """
+        interval = self._interval
+        rate_limit = self.rate_limit
+        subnet_rate = self._config.subnet_packet_rate
+        if not subnet_rate:
+            self._subnet_rate_limits.clear()
+        allowed = []
+        for target in targets:
+            if not target.rate_limited:
+                ready = now
+                if rate_limit is not None:
+                    ready = rate_limit.reserve(now)
+                if subnet_rate:
+                    subnet = target.client.ip_address.rpartition('.')[0]
+                    subnet_limit = self._bucket(self._subnet_rate_limits.get(subnet), subnet_rate)
+                    self._subnet_rate_limits[subnet] = subnet_limit
+                    ready = max(ready, subnet_limit.reserve(now))
+                if ready > now:
+                    target.rate_limited = True
+                    self._defer(target, ready)
+                    continue
+            target.rate_limited = False
+            self._reschedule(target, now, interval)
+            allowed.append(target)
+        return allowed
+
+    def _remove(self, target):
+        with self._lock:
+            self._targets.discard(target)
+        for key in target.in_flight:
+            del self._in_flight[key]
+        target.in_flight.clear()
+        group = target.group
+        if group is not None:
+            group.targets -= 1
+            if not group.targets and not self._datagram:
+                # none of its probes is in flight, the identifier can go to a new group
+                self._groups.remove(group)
+                self._identifiers.release(group.identifier)
+
+    def _pop_probe(self, key):
+        probe = self._in_flight.pop(key, None)
+        if probe is not None:
+            probe.target.in_flight.discard(key)
+        return probe
+
+    def _open_datagram_socket(self):
+        """open a new shared datagram socket, return None if it can not be opened"""
+        for _ in range(BIND_ATTEMPTS):
+            try:
+                identifier = self._identifiers.allocate()
+            except RuntimeError:
+                return None
+            try:
+                icmp_socket = open_datagram_socket(identifier)
+            except OSError as error:
+                self._identifiers.release(identifier)
+                if error.errno != errno.EADDRINUSE:
+                    return None
+                # another process pings with this identifier, try the next one
+                continue
+            icmp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            self._enable_timestamps(icmp_socket)
+            shared = DatagramSocket(icmp_socket, identifier)
+            self._selector.register(icmp_socket, selectors.EVENT_READ, shared)
+            self._groups.append(shared)
+            return shared
+        return None
+
+    def _open_group(self):
+        """open a new identifier group, return None if there is no identifier (or datagram socket) left"""
+        if self._datagram:
+            return self._open_datagram_socket()
+        try:
+            group = IdentifierGroup(self._identifiers.allocate())
+        except RuntimeError:
+            return None
+        self._groups.append(group)
+        return group
+
+    def _assign_group(self, target):
+        """give target an identifier group, return False if there is none"""
+        if target.group is not None:
+            return True
+        group = next((group for group in self._groups if group.targets < IDENTIFIER_TARGETS),
+                     None) or self._open_group()
+        if group is None:
+            if not self._groups:
+                return False
+            # no group can be opened (e.g. out of file descriptors), crowd the least used one
+            group = min(self._groups, key=lambda item: item.targets)
+        group.targets += 1
+        target.group = group
+        return True
+
+    def _expire(self, now):
+        """
+        report the probes whose timeout passed and return the next deadline.
+        timed out probes stay matchable for another timeout so late replies are still accounted
+        """
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, key = heapq.heappop(self._deadlines)
+            probe = self._in_flight.get(key)
+            if probe is None:
+                continue
+            if probe.timed_out:
+                self._pop_probe(key)
+            else:
+                probe.timed_out = True
+                probe.target.add_loss()
+                # matchable for another timeout, and at least for the whole ping timeout after an adaptive one
+                keep_until = max(probe.deadline + (probe.deadline - probe.sent_time),
+                                 probe.sent_time + self._config.ping_timeout / 1000)
+                heapq.heappush(self._deadlines, (keep_until, key))
+                probe.target.client.on_reply('Request timed out.', 0)
+        return self._deadlines[0][0] if self._deadlines else now + self._interval
+
+    def _send(self, targets):
+        ttl = self._config.ping_ttl
+        size = self._config.ping_buffer_size
+        failed = set()
+        # perf_counter_ns and time_ns of every probe, taken right before its own send: a local host can answer
+        # (and the kernel stamp the reply) before sendto returns, a later stamp would make the rtt negative
+        stamps = [(0, 0)] * len(targets)
+        packets = []
+        for index, target in enumerate(targets):
+            sequence = target.group.next_sequence(self._in_flight) if self._assign_group(target) else None
+            if sequence is None:
+                failed.add(index)
+                packets.append((None, None, b''))
             else:
-                if self.is_timeout:
-                    answer = ('Request timed out.', 0)
-        return answer
+                packets.append((target.group.identifier, sequence, target.group.packet(size, sequence)))
+        sendable = [index for index in range(len(targets)) if index not in failed]
+        if self._datagram:
+            for index in sendable:
+                shared = targets[index].group
+                try:
+                    if ttl != shared.ttl:
+                        shared.socket.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                        shared.ttl = ttl
+                    stamps[index] = time.perf_counter_ns(), time.time_ns()
+                    shared.socket.sendto(packets[index][2], (targets[index].client.ip_address, 0))
+                except OSError:
+                    failed.add(index)
+        else:
+            if ttl != self._ttl:
+                self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                self._ttl = ttl
+            for index in sendable:
+                stamps[index] = time.perf_counter_ns(), time.time_ns()
+                try:
+                    self._socket.sendto(packets[index][2], (targets[index].client.ip_address, 0))
+                except OSError:
+                    failed.add(index)
+        sent_time = time.monotonic()
+        max_timeout = self._config.ping_timeout / 1000
+        adaptive = self._config.adaptive_timeout
+        for index, (target, (identifier, sequence, packet)) in enumerate(zip(targets, packets)):
+            if index in failed:
+                target.client.on_reply('General failure.', 0)
+                continue
+            deadline = sent_time + (target.timeout(max_timeout) if adaptive else max_timeout)
+            probe = PingProbe(target, identifier, sequence, len(packet), sent_time, deadline, *stamps[index])
+            self._in_flight[probe.key] = probe
+            target.in_flight.add(probe.key)
+            heapq.heappush(self._deadlines, (deadline, probe.key))
+
+    def _receive_all(self):
+        while True:
+            try:
+                if self._kernel_timestamps:
+                    size, ancdata, _, _ = self._socket.recvmsg_into([self._buffer], ANCILLARY_SIZE)
+                else:
+                    size, ancdata = self._socket.recv_into(self._buffer), []
+            except (BlockingIOError, InterruptedError):
+                return
+            self._on_reply(self._buffer, size, time.perf_counter_ns(), kernel_timestamp(ancdata))
+
+    def _receive_datagram(self, shared):
+        while True:
+            reply = receive_datagram(shared.socket, self._buffer)
+            if reply is None:
+                return
+            response_type, response_sequence, ttl, src_ip, received_wall_ns = reply
+            probe = self._pop_probe((shared.identifier, response_sequence))
+            if probe is not None:
+                self._answer(probe, response_type, src_ip, ttl, time.perf_counter_ns(), received_wall_ns)
+
+    def _on_reply(self, buffer, size, now_ns, received_wall_ns):
+        reply = parse_reply(buffer, size)
+        if not reply:
+            return
+        response_type, response_identifier, response_sequence, ttl = reply
+        probe = self._pop_probe((response_identifier, response_sequence))
+        if probe is not None:
+            self._answer(probe, response_type, source_address(buffer), ttl, now_ns, received_wall_ns)
+
+    def _answer(self, probe, response_type, src_ip, ttl, now_ns, received_wall_ns):
+        rtt_ns = now_ns - probe.sent_ns
+        if received_wall_ns is not None:
+            # the kernel stamped the reply when it arrived, before this thread woke up. it is on the wall
+            # clock, so it is only trusted when it agrees with the monotonic measure (no clock step between)
+            kernel_rtt_ns = received_wall_ns - probe.sent_wall_ns
+            if 0 < kernel_rtt_ns <= rtt_ns:
+                rtt_ns = kernel_rtt_ns
+        if response_type == ICMP_ECHO_REPLY:
+            # late replies count too, they show the timeout was too short
+            probe.target.add_sample(rtt_ns / 10 ** 9)
+        rtt = round_rtt(rtt_ns)
+        answer = reply_answer(response_type, src_ip, probe.size, rtt, ttl)
+        if probe.timed_out:
+            probe.target.client.on_late_reply(*answer)
+        else:
+            probe.target.client.on_reply(*answer)
+
+
+class AsyncPingEngine:
+    """
+    asyncio version of PingEngine: one raw socket read with loop.add_reader,
+    every probe waits on a future keyed by its (identifier, sequence)
+    """
+    def __init__(self):
+        self._identifier = identifiers.allocate()
+        self._sequence = 0
+        self._socket = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ttl = None
+        self._waiters: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._templates: Dict[int, PacketTemplate] = {}
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+
+    def _open(self):
+        if self._identifier is None:
+            self._identifier = identifiers.allocate()
+            self._templates = {}
+        if self._socket is None:
+            self._loop = asyncio.get_running_loop()
+            self._socket = open_raw_socket()
+            self._loop.add_reader(self._socket, self._on_readable)
 
     def close(self):
-        self._socket.close()
+        if self._socket is not None:
+            self._loop.remove_reader(self._socket)
+            self._socket.close()
+            self._socket = None
+        for waiter in self._waiters.values():
+            waiter.cancel()
+        self._waiters = {}
+        if self._identifier is not None:
+            identifiers.release(self._identifier)
+            self._identifier = None
+
+    def _next_key(self):
+        # skip sequences still in flight, so tens of thousands of probes can share one identifier
+        for _ in range(2 ** 16):
+            self._sequence = (self._sequence + 1) % 2 ** 16
+            if (self._identifier, self._sequence) not in self._waiters:
+                return self._identifier, self._sequence
+        raise RuntimeError('too many probes in flight')
+
+    async def ping(self, ip, buffer_size=32, ttl=128, timeout=4000):
+        """send one echo request to ip and return (answer, rtt) like PingSocket.receive"""
+        self._open()
+        key = self._next_key()
+        if buffer_size not in self._templates:
+            self._templates[buffer_size] = PacketTemplate(self._identifier, buffer_size)
+        packet = self._templates[buffer_size].packet(key[1])
+        if ttl != self._ttl:
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            self._ttl = ttl
+        waiter = self._loop.create_future()
+        self._waiters[key] = waiter
+        try:
+            try:
+                self._socket.sendto(packet, (ip, 0))
+            except OSError:
+                return 'General failure.', 0
+            start_ns = time.perf_counter_ns()
+            try:
+                response_type, src_ip, ttl, end_ns = await asyncio.wait_for(waiter, timeout / 1000)
+            except asyncio.TimeoutError:
+                return 'Request timed out.', 0
+            rtt = round_rtt(end_ns - start_ns)
+            return reply_answer(response_type, src_ip, len(packet), rtt, ttl)
+        finally:
+            self._waiters.pop(key, None)
+
+    async def results(self, ips, buffer_size=32, ttl=128, timeout=4000, interval=1000, count=None):
+        """
+        ping every address in ips once per interval and yield (ip, answer, rtt) as the results arrive,
+        forever or count times per address
+        """
+        queue = asyncio.Queue()
+
+        async def pinger(ip):
+            sent = 0
+            while count is None or sent < count:
+                start_time = time.monotonic()
+                await queue.put((ip, *await self.ping(ip, buffer_size, ttl, timeout)))
+                sent += 1
+                await asyncio.sleep(max(interval / 1000 - (time.monotonic() - start_time), 0))
+
+        tasks = [asyncio.ensure_future(pinger(ip)) for ip in ips]
+        remaining = len(tasks) * count if count is not None else None
+        try:
+            while remaining is None or remaining > 0:
+                yield await queue.get()
+                if remaining is not None:
+                    remaining -= 1
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _on_readable(self):
+        while True:
+            try:
+                size, src_ip = self._socket.recvfrom_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            now_ns = time.perf_counter_ns()
+            reply = parse_reply(self._buffer, size)
+            if not reply:
+                continue
+            response_type, response_identifier, response_sequence, ttl = reply
+            waiter = self._waiters.get((response_identifier, response_sequence))
+            if waiter and not waiter.done():
+                waiter.set_result((response_type, src_ip[0], ttl, now_ns))
+
+
+class ResultTable:
+    """
+    the last result of every target in shared memory, one record per slot, so any process can read the state
+    of all the targets without pickling, queues or locks. a slot has a single writer, its version is odd while
+    the record is written and readers retry until they see the same even version before and after the read
+    """
+    # version, kind, rtt (us), replies, losses, updated (time.time()), answer
+    RECORD = struct.Struct(f'=IIIII4xd{RESULT_ANSWER_SIZE}s')
+
+    def __init__(self, size=RESULT_TABLE_SIZE, name=None):
+        if name is None:
+            self._memory = multiprocessing.shared_memory.SharedMemory(create=True, size=size * self.RECORD.size)
+        else:
+            self._memory = multiprocessing.shared_memory.SharedMemory(name=name)
+        self._owner = name is None
+        self._size = size
+        self._buffer = self._memory.buf
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def size(self):
+        return self._size
+
+    def _store(self, offset, version, *fields):
+        # a record left half written by a dead writer is odd, it is made even again
+        version += version % 2
+        struct.pack_into('=I', self._buffer, offset, version + 1)
+        self.RECORD.pack_into(self._buffer, offset, version + 1, *fields)
+        struct.pack_into('=I', self._buffer, offset, version + 2)
+
+    def reset(self, slot):
+        offset = slot * self.RECORD.size
+        self._store(offset, self.RECORD.unpack_from(self._buffer, offset)[0], RESULT_NONE, 0, 0, 0, 0.0, b'')
+
+    def write(self, slot, kind, rtt, answer=''):
+        offset = slot * self.RECORD.size
+        version, _, last_rtt, replies, losses, _, _ = self.RECORD.unpack_from(self._buffer, offset)
+        if kind == RESULT_REPLY:
+            replies += 1
+            last_rtt = rtt
+        elif kind == RESULT_TIMEOUT:
+            losses += 1
+        self._store(offset, version, kind, last_rtt, replies, losses, time.time(), answer.encode())
+
+    def read(self, slot):
+        """
+        return (version, kind, rtt, replies, losses, updated, answer) of slot, answer as bytes.
+        None if the record stays half written for RESULT_READ_ATTEMPTS reads
+        """
+        offset = slot * self.RECORD.size
+        for _ in range(RESULT_READ_ATTEMPTS):
+            record = self.RECORD.unpack_from(self._buffer, offset)
+            if record[0] % 2 == 0 and struct.unpack_from('=I', self._buffer, offset)[0] == record[0]:
+                return record
+        return None
+
+    def close(self):
+        self._buffer = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+
+class RangeSweep:
+    """
+    discovery sweep: pings every address of ips once, from one socket, and collects the addresses that answered
+    until timeout ms after the last probe. limit is the TokenBucket of the packet rate, shared with the ping
+    engine (its rate_limit) so both together keep to one cap, None for no limit.
+    ips can be any iterable, it is read lazily one chunk at a time: every SWEEP_CHUNK_SIZE addresses share an
+    identifier and are told apart by their sequence. total is the number of addresses, for progress only.
+    runs in its own thread, poll done and read responders (in the order of ips) once it is set
+    """
+    def __init__(self, ips, limit: Optional[TokenBucket], timeout, buffer_size=32, datagram=False, total=None):
+        self._ips = iter(ips)
+        self._total = total
+        self._limit = limit
+        self._timeout = timeout / 1000
+        self._buffer_size = buffer_size
+        self._datagram = datagram
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        # index of the probe -> the address that answered it
+        self._answered: Dict[int, str] = {}
+        # the addresses of the chunks that can still be answered, and (when they stop, chunk) of the sent ones
+        self._chunks: Dict[int, List[str]] = {}
+        self._expiry: Deque[Tuple[float, int]] = collections.deque()
+        self._sent = 0
+        self._cancelled = False
+        self._done = False
+        self._error: Optional[OSError] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def sent(self):
+        return self._sent
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def error(self):
+        """the error that stopped the sweep (e.g. no permission to open the socket), None if there was none"""
+        return self._error
+
+    @property
+    def responders(self):
+        # only the probed address answers a probe, an address given twice in ips is listed once
+        return list(dict.fromkeys(self._answered[index] for index in sorted(self._answered)))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _run(self):
+        try:
+            if self._datagram:
+                self._sweep_datagram()
+            else:
+                self._sweep_raw()
+        except OSError as error:
+            self._error = error
+        finally:
+            self._done = True
+
+    def _send_all(self, selector, open_chunk, send, receive):
+        chunk = 0
+        while not self._cancelled:
+            addresses = list(itertools.islice(self._ips, SWEEP_CHUNK_SIZE))
+            if not addresses:
+                break
+            while self._expiry and self._expiry[0][0] < time.monotonic():
+                del self._chunks[self._expiry.popleft()[1]]
+            self._chunks[chunk] = addresses
+            open_chunk(chunk)
+            for sequence, ip in enumerate(addresses):
+                if self._cancelled:
+                    return
+                if self._limit is not None:
+                    ready = self._limit.reserve(time.monotonic())
+                    while not self._cancelled and time.monotonic() < ready:
+                        self._wait(selector, receive, min(ready - time.monotonic(), SWEEP_WAIT))
+                failures = 0
+                while not self._cancelled:
+                    try:
+                        send(chunk, sequence, ip)
+                    except BlockingIOError:
+                        # the send buffer is full, let it drain
+                        self._wait(selector, receive, SWEEP_WAIT)
+                        continue
+                    except OSError:
+                        # an error left on the socket by an earlier probe fails this send once, then it is cleared
+                        failures += 1
+                        if failures < 2:
+                            continue
+                    break
+                self._sent += 1
+                if self._sent % SWEEP_DRAIN == 0:
+                    self._wait(selector, receive, 0)
+            self._expiry.append((time.monotonic() + self._timeout, chunk))
+            chunk += 1
+        deadline = time.monotonic() + self._timeout
+        while not self._cancelled and time.monotonic() < deadline:
+            self._wait(selector, receive, min(deadline - time.monotonic(), SWEEP_WAIT))
+
+    @staticmethod
+    def _wait(selector, receive, timeout):
+        for key, _ in selector.select(max(timeout, 0)):
+            receive(key.fileobj, key.data)
+
+    def _answer(self, chunk, sequence, src_ip):
+        # the raw socket sees every echo reply of the host, a reply from another address than the probed one
+        # is not an answer to the sweep (e.g. an engine target that got the same identifier and sequence)
+        addresses = self._chunks.get(chunk)
+        if addresses is not None and sequence < len(addresses) and addresses[sequence] == src_ip:
+            self._answered[chunk * SWEEP_CHUNK_SIZE + sequence] = src_ip
+
+    def _sweep_raw(self):
+        icmp_socket = open_raw_socket()
+        chunk_of: Dict[int, int] = {}
+        templates: List[PacketTemplate] = []
+
+        def open_chunk(chunk):
+            identifier = identifiers.allocate()
+            chunk_of[identifier] = chunk
+            templates.append(PacketTemplate(identifier, self._buffer_size))
+
+        def send(chunk, sequence, ip):
+            icmp_socket.sendto(templates[chunk].packet(sequence), (ip, 0))
+
+        def receive(sock, _):
+            while True:
+                try:
+                    size = sock.recv_into(self._buffer)
+                except (BlockingIOError, InterruptedError):
+                    return
+                reply = parse_reply(self._buffer, size)
+                if reply and reply[0] == ICMP_ECHO_REPLY and reply[1] in chunk_of:
+                    self._answer(chunk_of[reply[1]], reply[2], source_address(self._buffer))
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(icmp_socket, selectors.EVENT_READ)
+            try:
+                self._send_all(selector, open_chunk, send, receive)
+            finally:
+                icmp_socket.close()
+                for identifier in chunk_of:
+                    identifiers.release(identifier)
+
+    def _sweep_datagram(self):
+        sockets: List[socket.socket] = []
+        templates: List[PacketTemplate] = []
+
+        def open_chunk(chunk):
+            # port 0, the kernel binds the socket to a free identifier on its first send
+            icmp_socket = open_datagram_socket(0)
+            icmp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            sockets.append(icmp_socket)
+            templates.append(PacketTemplate(0, self._buffer_size))
+            selector.register(icmp_socket, selectors.EVENT_READ, chunk)
+
+        def send(chunk, sequence, ip):
+            sockets[chunk].sendto(templates[chunk].packet(sequence), (ip, 0))
+
+        def receive(sock, chunk):
+            while True:
+                reply = receive_datagram(sock, self._buffer)
+                if reply is None:
+                    return
+                if reply[0] == ICMP_ECHO_REPLY:
+                    self._answer(chunk, reply[1], reply[3])
+
+        with selectors.DefaultSelector() as selector:
+            try:
+                self._send_all(selector, open_chunk, send, receive)
+            finally:
+                for icmp_socket in sockets:
+                    icmp_socket.close()
+
+
+class EngineConfig:
+    """the settings a PingEngine reads, as a plain object that can be sent to a worker process"""
+    def __init__(self, config, shards=1):
+        self.running = config.running
+        self.ping_sleep_timer = config.ping_sleep_timer
+        self.ping_timeout = config.ping_timeout
+        self.ping_buffer_size = config.ping_buffer_size
+        self.ping_ttl = config.ping_ttl
+        self.kernel_filter = config.kernel_filter
+        self.socket_type = config.socket_type
+        self.adaptive_timeout = config.adaptive_timeout
+        # every shard gets its part of the rate limits
+        self.max_packet_rate = -(-config.max_packet_rate // shards)
+        self.subnet_packet_rate = -(-config.subnet_packet_rate // shards)
+
+    def __eq__(self, other):
+        return isinstance(other, EngineConfig) and vars(self) == vars(other)
+
+
+class ShardClient:
+    """
+    stands for a client of the gui process inside a worker, its results are written to its slot of the
+    result table and only the slot is queued, to tell the gui process it changed
+    """
+    def __init__(self, index, ip_address, changed, table: ResultTable):
+        self.ip_address = ip_address
+        self.pause = False
+        self.is_alive = True
+        self._index = index
+        self._changed = changed
+        self._table = table
+
+    def on_reply(self, answer, rtt):
+        self._table.write(self._index, RESULT_REPLY if rtt else RESULT_TIMEOUT, rtt, answer)
+        self._changed.append(self._index)
+
+    def on_late_reply(self, answer, rtt):
+        self._table.write(self._index, RESULT_LATE_REPLY, rtt, answer)
+        self._changed.append(self._index)
+
+    def on_pause(self):
+        self._table.write(self._index, RESULT_PAUSE, 0)
+        self._changed.append(self._index)
+
+
+def shard_worker(commands, results, table_name, first, last, config):
+    """
+    worker process of ShardedPingEngine, pings its targets with its own PingEngine and identifiers in
+    [first, last] and writes their results to the result table. every SHARD_FLUSH_INTERVAL it sends back
+    (changed slots, removed slots): the slots written since the last batch, once each and packed as an array of
+    unsigned ints (cheap to pickle), and the slots of the removed clients, which are no longer written
+    """
+    table = ResultTable(name=table_name)
+    engine = PingEngine(config, allocator=IdentifierAllocator(first, last))
+    clients: Dict[int, ShardClient] = {}
+    # filled by the engine thread
+    changed: Deque[int] = collections.deque()
+    removed: List[int] = []
+    while config.running:
+        try:
+            message = commands.get(timeout=SHARD_FLUSH_INTERVAL)
+            while True:
+                command, *args = message
+                if command == SHARD_ADD:
+                    index, ip_address = args
+                    clients[index] = ShardClient(index, ip_address, changed, table)
+                    engine.add(clients[index])
+                elif command == SHARD_SET_PAUSE:
+                    index, pause = args
+                    clients[index].pause = pause
+                elif command == SHARD_REMOVE:
+                    clients.pop(args[0]).is_alive = False
+                    removed.append(args[0])
+                elif command == SHARD_CONFIG:
+                    # the engine keeps reading the same object
+                    vars(config).update(vars(args[0]))
+                message = commands.get_nowait()
+        except queue.Empty:
+            pass
+        if changed or removed:
+            slots = dict.fromkeys(changed.popleft() for _ in range(len(changed)))
+            results.put((array.array('I', slots).tobytes(), removed))
+            removed = []
+    engine.join()
+    if changed:
+        results.put((array.array('I', dict.fromkeys(changed)).tobytes(), []))
+    table.close()
+    results.put(None)
+
+
+class ShardedPingEngine:
+    """
+    same interface as PingEngine, but the targets are sharded over worker processes, each one with its own
+    PingEngine, so probing is not bound to the one core of the gil. every worker gets its own part of the
+    icmp identifiers, so the kernel filter of each raw socket only passes the replies of its own targets.
+    the last part is left to the shared allocator of this process, for a RangeSweep or an AsyncPingEngine.
+    clients are sharded by their address, so the clients of an address share the one target of their worker.
+    the results are not sent back: every client has a slot of a ResultTable in shared memory its worker writes
+    the last result to. the workers only send back the slots that changed, through one queue, and a thread of
+    this process calls client.on_result() for them. the client reads its result with result(client).
+    the clients are not polled: changed(client) has to be called when the pause, the address or is_alive of a
+    client changes.
+    the slot of a removed (or moved) client is reused only after its worker confirmed it no longer writes it
+    """
+    def __init__(self, config, processes):
+        self._config = config
+        self._processes = processes
+        self._config_sent: Optional[EngineConfig] = None
+        self._commands: List[multiprocessing.Queue] = []
+        self._results: Optional[multiprocessing.Queue] = None
+        self._workers: List[multiprocessing.Process] = []
+        self._clients: Dict[int, list] = {}
+        self._slots: Dict[Any, int] = {}
+        # the clients to sync, only they are read by _sync
+        self._changed: Set[Any] = set()
+        self._indexes = IdentifierAllocator(0, RESULT_TABLE_SIZE - 1)
+        self._span = (LAST_IDENTIFIER - FIRST_IDENTIFIER + 1) // (processes + 1)
+        identifiers.restrict(FIRST_IDENTIFIER + processes * self._span, LAST_IDENTIFIER)
+        self._table: Optional[ResultTable] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, client):
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            self._add(client, self._shard(client.ip_address))
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def capacity(self):
+        """the most clients the engine pings at once, one slot of the result table each"""
+        return RESULT_TABLE_SIZE
+
+    def changed(self, client):
+        """client.pause, client.ip_address or client.is_alive changed, sent to its worker on the next sync"""
+        with self._lock:
+            self._changed.add(client)
+
+    @property
+    def rate_limit(self):
+        """
+        a token bucket for a RangeSweep at the part of config.max_packet_rate the workers leave over, at least a
+        packet a second, None without a limit. the workers probe every address at most once an interval
+        """
+        rate = self._config.max_packet_rate
+        if not rate:
+            return None
+        with self._lock:
+            addresses = len({ip_address for _, pause, ip_address, _ in self._clients.values() if not pause})
+        left = max(rate - addresses * 1000 / self._config.ping_sleep_timer, 1)
+        return TokenBucket(left, max(left * RATE_BURST, 1))
+
+    def result(self, client):
+        """
+        return (version, kind, rtt, replies, losses, updated, answer) of the last result of client from the result
+        table, the version changes with every result. None if client is not pinged by this engine, or not yet at
+        its current address
+        """
+        with self._lock:
+            index = self._slots.get(client)
+            entry = self._clients.get(index)
+        table = self._table
+        if entry is None or table is None or entry[2] != client.ip_address:
+            return None
+        record = table.read(index)
+        if record is None:
+            return None
+        *record, answer = record
+        return (*record, answer.rstrip(b'\0').decode(errors='ignore'))
+
+    def _add(self, client, shard):
+        # under the lock. the slot is cleared before its worker gets it, no one else writes it by then
+        try:
+            index = self._indexes.allocate()
+        except RuntimeError:
+            raise RuntimeError(f'all {RESULT_TABLE_SIZE} rows are in use') from None
+        self._table.reset(index)
+        self._clients[index] = [client, False, client.ip_address, shard]
+        self._slots[client] = index
+        self._commands[shard].put((SHARD_ADD, index, client.ip_address))
+
+    def _shard(self, ip_address):
+        return zlib.crc32(ip_address.encode()) % self._processes
+
+    def _start(self):
+        self._config_sent = EngineConfig(self._config, self._processes)
+        self._table = ResultTable()
+        self._results = multiprocessing.Queue()
+        for shard in range(self._processes):
+            first = FIRST_IDENTIFIER + shard * self._span
+            commands = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=shard_worker, daemon=True,
+                                             args=(commands, self._results, self._table.name, first,
+                                                   first + self._span - 1, self._config_sent))
+            worker.start()
+            self._commands.append(commands)
+            self._workers.append(worker)
+        self._thread = threading.Thread(target=self._loop)
+        self._thread.start()
+
+    def _send_all(self, message):
+        for commands in self._commands:
+            commands.put(message)
+
+    def _loop(self):
+        running_workers = self._processes
+        next_sync = 0
+        while running_workers:
+            try:
+                batch = self._results.get(timeout=SHARD_FLUSH_INTERVAL)
+            except queue.Empty:
+                batch = b'', []
+            if batch is None:
+                running_workers -= 1
+                continue
+            changed, removed = batch
+            for index in memoryview(changed).cast('I'):
+                entry = self._clients.get(index)
+                if entry is not None:
+                    entry[0].on_result()
+            for index in removed:
+                self._indexes.release(index)
+            if time.monotonic() >= next_sync:
+                self._sync()
+                next_sync = time.monotonic() + SHARD_FLUSH_INTERVAL
+        for worker in self._workers:
+            worker.join()
+        table, self._table = self._table, None
+        table.close()
+
+    def _sync(self):
+        """send the changes of the settings and of the clients to the workers"""
+        config = EngineConfig(self._config, self._processes)
+        if config != self._config_sent:
+            self._send_all((SHARD_CONFIG, config))
+            self._config_sent = config
+        if not config.running:
+            return
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        for client in changed:
+            with self._lock:
+                index = self._slots.get(client)
+                entry = self._clients.get(index)
+            if entry is None:
+                continue
+            _, pause, ip_address, shard = entry
+            commands = self._commands[shard]
+            if not client.is_alive:
+                # the slot is released when the worker confirms the removal
+                commands.put((SHARD_REMOVE, index))
+                with self._lock:
+                    del self._clients[index]
+                    del self._slots[client]
+                continue
+            if client.ip_address != ip_address:
+                # the address was edited, move the client to a new slot in the shard of its new address
+                commands.put((SHARD_REMOVE, index))
+                with self._lock:
+                    del self._clients[index]
+                    self._add(client, self._shard(client.ip_address))
+                    index = self._slots[client]
+                    entry = self._clients[index]
+                commands = self._commands[entry[3]]
+                pause = False
+            if client.pause != pause:
+                entry[1] = client.pause
+                commands.put((SHARD_SET_PAUSE, index, client.pause))
 
 
 def main():
@@ -1 +1,93 @@
 ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_DEST_UNREACHABLE = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_ERRORS = (ICMP_DEST_UNREACHABLE, ICMP_TIME_EXCEEDED)
+
+IP_HEADER_SIZE = 20
+ICMP_HEADER_SIZE = 8
+RECEIVE_BUFFER_SIZE = 2 ** 16
+SOCKET_BUFFER_SIZE = 2 ** 22
+PAYLOAD_PATTERN = bytes(range(256))
+PAYLOAD_CACHE_SIZE = 16
+NUMPY_CHECKSUM_SIZE = 4096
+
+# targets are spread over the ping interval by phase offsets of the golden ratio sequence,
+# probes due within one tick of each other are sent together
+PHASE_STEP = 0.6180339887498949
+SCHEDULE_TICK = 0.001
+
+# a token bucket holds this many seconds of its rate, at least one packet
+RATE_BURST = 0.1
+
+# ShardedPingEngine, commands to the workers
+SHARD_ADD = 0
+SHARD_SET_PAUSE = 1
+SHARD_REMOVE = 2
+SHARD_CONFIG = 3
+# seconds between the batches of changed slots of a worker, and between syncs of the clients to the workers
+SHARD_FLUSH_INTERVAL = 0.05
+
+# records of the shared result table of ShardedPingEngine, one per client. the pages of the shared memory are
+# only used once a slot is written, so a large table costs nothing while it is mostly empty
+RESULT_TABLE_SIZE = 2 ** 20
+RESULT_NONE = 0
+RESULT_REPLY = 1
+RESULT_TIMEOUT = 2
+RESULT_LATE_REPLY = 3
+RESULT_PAUSE = 4
+# bytes of the answer line kept in a record
+RESULT_ANSWER_SIZE = 64
+# reads of a record before it is given up as half written (its writer died while writing it)
+RESULT_READ_ATTEMPTS = 100
+
+# RangeSweep, addresses probed under one identifier (its sequence space) and the longest wait on the socket
+SWEEP_CHUNK_SIZE = 2 ** 16
+SWEEP_WAIT = 0.05
+# replies are read after every this many probes so they do not overflow the socket
+SWEEP_DRAIN = 64
+
+# adaptive timeout (rfc 6298): rto = srtt + 4 * rttvar, never under this many seconds
+ADAPTIVE_MIN_TIMEOUT = 0.02
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+
+# icmp identifiers handed out to targets, 0 is left out
+FIRST_IDENTIFIER = 1
+LAST_IDENTIFIER = 2 ** 16 - 1
+
+# unprivileged (SOCK_DGRAM) icmp sockets
+SOCKET_AUTO = 0
+SOCKET_RAW = 1
+SOCKET_DATAGRAM = 2
+PING_GROUP_RANGE_FILE = '/proc/sys/net/ipv4/ping_group_range'
+IP_RECVERR = 11
+IP_RECVTTL = 12
+SO_EE_ORIGIN_ICMP = 2
+SOCK_EXTENDED_ERR_SIZE = 16
+ANCILLARY_SIZE = 512
+# kernel receive timestamps as a timespec (asm-generic/socket.h)
+SO_TIMESTAMPNS = 35
+# tries to find an identifier no other process has bound a datagram socket to
+BIND_ATTEMPTS = 16
+# targets sharing one identifier (one datagram socket with datagram sockets) of PingEngine: their probes in
+# flight, kept for up to twice the timeout, must fit its 2 ** 16 sequences (1024 * (2 * 10 s / 0.5 s + 1) < 2 ** 16)
+IDENTIFIER_TARGETS = 1024
+
+# classic bpf (linux/filter.h)
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+BPF_LD_B_IND = 0x50
+BPF_LD_H_IND = 0x48
+BPF_LDX_B_MSH = 0xb1
+BPF_ALU_AND_K = 0x54
+BPF_ALU_LSH_K = 0x64
+BPF_ALU_ADD_X = 0x0c
+BPF_MISC_TAX = 0x07
+BPF_JMP_JA = 0x05
+BPF_JMP_JEQ_K = 0x15
+BPF_JMP_JGT_K = 0x25
+BPF_JMP_JGE_K = 0x35
+BPF_RET_K = 0x06
+# the kernel filter covers the identifiers handed out so far, rounded up to a block to re-attach it rarely
+FILTER_BLOCK = 256
@@ -21,6 +21,14 @@ class Settings:
         self._max_threshold = None
         self._log_save = None
         self._log_ignore_dock = None
+        self._kernel_filter = None
+        self._socket_type = None
+        self._max_packet_rate = None
+        self._subnet_packet_rate = None
+        self._ping_processes = None
+        self._adaptive_timeout = None
+        self._virtual_table = None
+        self._window_history = None
         self.config_params = self._read_settings_file()
 
     @property
@@ -58,7 +66,8 @@ class Settings:
                     items[key] = int(value)
         except (OSError, ValueError):
             items = DEFAULT_SETTINGS
-        return items
+        # settings added after the file was written keep their default
+        return {**DEFAULT_SETTINGS, **items}
 
     def set_text_size(self, new_text_size):
         self._text_size = new_text_size
@@ -125,6 +134,38 @@ class Settings:
     def log_ignore_dock(self):
         return self._log_ignore_dock
 
+    @property
+    def kernel_filter(self):
+        return self._kernel_filter
+
+    @property
+    def socket_type(self):
+        return self._socket_type
+
+    @property
+    def max_packet_rate(self):
+        return self._max_packet_rate
+
+    @property
+    def subnet_packet_rate(self):
+        return self._subnet_packet_rate
+
+    @property
+    def ping_processes(self):
+        return self._ping_processes
+
+    @property
+    def adaptive_timeout(self):
+        return self._adaptive_timeout
+
+    @property
+    def virtual_table(self):
+        return self._virtual_table
+
+    @property
+    def window_history(self):
+        return self._window_history
+
     @property
     def config_params(self):
         return {Config.TEXT_SIZE: self.text_size,
@@ -137,7 +178,15 @@ class Settings:
                 Config.MIN_THRESHOLD: self.min_threshold,
                 Config.MAX_THRESHOLD: self.max_threshold,
                 Config.LOG_SAVE: self._log_save,
-                Config.LOG_IGNORE_DOCK: self._log_ignore_dock}
+                Config.LOG_IGNORE_DOCK: self._log_ignore_dock,
+                Config.KERNEL_FILTER: self._kernel_filter,
+                Config.SOCKET_TYPE: self._socket_type,
+                Config.MAX_PACKET_RATE: self._max_packet_rate,
+                Config.SUBNET_PACKET_RATE: self._subnet_packet_rate,
+                Config.PING_PROCESSES: self._ping_processes,
+                Config.ADAPTIVE_TIMEOUT: self._adaptive_timeout,
+                Config.VIRTUAL_TABLE: self._virtual_table,
+                Config.WINDOW_HISTORY: self._window_history}
 
     @config_params.setter
     def config_params(self, config_params):
@@ -152,6 +201,14 @@ class Settings:
         self._max_threshold = config_params[Config.MAX_THRESHOLD]
         self._log_save = config_params[Config.LOG_SAVE]
         self._log_ignore_dock = config_params[Config.LOG_IGNORE_DOCK]
+        self._kernel_filter = config_params[Config.KERNEL_FILTER]
+        self._socket_type = config_params[Config.SOCKET_TYPE]
+        self._max_packet_rate = config_params[Config.MAX_PACKET_RATE]
+        self._subnet_packet_rate = config_params[Config.SUBNET_PACKET_RATE]
+        self._ping_processes = config_params[Config.PING_PROCESSES]
+        self._adaptive_timeout = config_params[Config.ADAPTIVE_TIMEOUT]
+        self._virtual_table = config_params[Config.VIRTUAL_TABLE]
+        self._window_history = config_params[Config.WINDOW_HISTORY]
         if self._root:
             self._set_config()
 
@@ -13,6 +13,14 @@ class Config(BaseEnum):
     MAX_THRESHOLD = 'max threshold (ms)'
     LOG_SAVE = 'save log (hours)'
     LOG_IGNORE_DOCK = 'ignore dock on log (T/F)'
+    KERNEL_FILTER = 'kernel reply filter (T/F)'
+    SOCKET_TYPE = 'ping socket (0 auto, 1 raw, 2 dgram)'
+    MAX_PACKET_RATE = 'max packets per second (0 no limit)'
+    SUBNET_PACKET_RATE = 'max packets per second per /24 (0 no limit)'
+    PING_PROCESSES = 'ping processes (0 in process)'
+    ADAPTIVE_TIMEOUT = 'adaptive timeout (T/F)'
+    VIRTUAL_TABLE = 'virtual tables (T/F)'
+    WINDOW_HISTORY = 'detail window history (lines)'
 
 
 class Default(BaseEnum):
@@ -27,6 +35,14 @@ class Default(BaseEnum):
     MAX_THRESHOLD = 1000
     LOG_SAVE = 72
     LOG_IGNORE_DOCK = 0
+    KERNEL_FILTER = 1
+    SOCKET_TYPE = 0
+    MAX_PACKET_RATE = 2000
+    SUBNET_PACKET_RATE = 0
+    PING_PROCESSES = 0
+    ADAPTIVE_TIMEOUT = 0
+    VIRTUAL_TABLE = 0
+    WINDOW_HISTORY = 1000
 
 
 class RangeOf(BaseEnum):
@@ -41,6 +57,14 @@ class RangeOf(BaseEnum):
     MAX_THRESHOLD = (0, 2500)
     LOG_SAVE = (0, 168)
     LOG_IGNORE_DOCK = (0, 1)
+    KERNEL_FILTER = (0, 1)
+    SOCKET_TYPE = (0, 2)
+    MAX_PACKET_RATE = (0, 100000)
+    SUBNET_PACKET_RATE = (0, 100000)
+    PING_PROCESSES = (0, 64)
+    ADAPTIVE_TIMEOUT = (0, 1)
+    VIRTUAL_TABLE = (0, 1)
+    WINDOW_HISTORY = (10, 100000)
 
 
 DEFAULT_SETTINGS = {Config.TEXT_SIZE: Default.TEXT_SIZE,
@@ -53,7 +77,15 @@ DEFAULT_SETTINGS = {Config.TEXT_SIZE: Default.TEXT_SIZE,
                     Config.MIN_THRESHOLD: Default.MIN_THRESHOLD,
                     Config.MAX_THRESHOLD: Default.MAX_THRESHOLD,
                     Config.LOG_SAVE: Default.LOG_SAVE,
-                    Config.LOG_IGNORE_DOCK: Default.LOG_IGNORE_DOCK}
+                    Config.LOG_IGNORE_DOCK: Default.LOG_IGNORE_DOCK,
+                    Config.KERNEL_FILTER: Default.KERNEL_FILTER,
+                    Config.SOCKET_TYPE: Default.SOCKET_TYPE,
+                    Config.MAX_PACKET_RATE: Default.MAX_PACKET_RATE,
+                    Config.SUBNET_PACKET_RATE: Default.SUBNET_PACKET_RATE,
+                    Config.PING_PROCESSES: Default.PING_PROCESSES,
+                    Config.ADAPTIVE_TIMEOUT: Default.ADAPTIVE_TIMEOUT,
+                    Config.VIRTUAL_TABLE: Default.VIRTUAL_TABLE,
+                    Config.WINDOW_HISTORY: Default.WINDOW_HISTORY}
 
 RANGE_OF_SETTINGS = {Config.TEXT_SIZE: RangeOf.TEXT_SIZE,
                      Config.SLEEP_TIMER: RangeOf.PING_SLEEP_TIMER,
@@ -65,7 +97,15 @@ RANGE_OF_SETTINGS = {Config.TEXT_SIZE: RangeOf.TEXT_SIZE,
                      Config.MIN_THRESHOLD: RangeOf.MIN_THRESHOLD,
                      Config.MAX_THRESHOLD: RangeOf.MAX_THRESHOLD,
                      Config.LOG_SAVE: RangeOf.LOG_SAVE,
-                     Config.LOG_IGNORE_DOCK: RangeOf.LOG_IGNORE_DOCK}
+                     Config.LOG_IGNORE_DOCK: RangeOf.LOG_IGNORE_DOCK,
+                     Config.KERNEL_FILTER: RangeOf.KERNEL_FILTER,
+                     Config.SOCKET_TYPE: RangeOf.SOCKET_TYPE,
+                     Config.MAX_PACKET_RATE: RangeOf.MAX_PACKET_RATE,
+                     Config.SUBNET_PACKET_RATE: RangeOf.SUBNET_PACKET_RATE,
+                     Config.PING_PROCESSES: RangeOf.PING_PROCESSES,
+                     Config.ADAPTIVE_TIMEOUT: RangeOf.ADAPTIVE_TIMEOUT,
+                     Config.VIRTUAL_TABLE: RangeOf.VIRTUAL_TABLE,
+                     Config.WINDOW_HISTORY: RangeOf.WINDOW_HISTORY}
 
 SETTINGS_FILE = 'settings.txt'
 TEXT_HEAD_RATIO = 1